@@ -0,0 +1,412 @@
+"""
+Long-running query daemon.
+
+The daemon keeps `DBConnectionRunner` instances (and therefore their engines
+and connection pools) warm between queries and exposes them through a small
+HTTP API bound to localhost:
+
+    GET  /health           -> {"status": "ok", "pid": ...}
+    POST /query            -> Arrow IPC stream of the result (X-Run-Id header)
+    GET  /reports/<run_id> -> JSON report of a finished run
+    POST /shutdown         -> stops the daemon
+
+While running, the daemon advertises its port and a random access token in
+`.cache/daemon.json`, readable only by its owner, which `DaemonClient.find`
+uses to route CLI invocations through it. Every request must carry the token
+in the `X-Daemon-Token` header and a localhost `Host` header, and POST bodies
+must be `application/json`, so neither other local users nor web pages
+(through cross-origin requests or DNS rebinding) can run statements with the
+daemon's credentials.
+"""
+
+import hmac
+import http.client
+import json
+import os
+import secrets
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Optional
+
+import pandas as pd
+import pyarrow as pa
+
+from .database.runner import DBConnectionRunner
+from .database.spill import SpilledResult
+from .logger import get_logger
+
+DAEMON_STATE_PATH = Path(".cache/daemon.json")
+MAX_REPORTS = 100
+TOKEN_HEADER = "X-Daemon-Token"
+
+
+class DaemonError(RuntimeError):
+    """
+    Raised when the daemon answers a request with an error.
+    """
+
+
+class _ChunkedWriter:
+    """
+    File-like adapter that writes HTTP/1.1 chunked transfer encoding.
+    """
+
+    def __init__(self: "_ChunkedWriter", wfile):
+        self.wfile = wfile
+        self.closed = False
+
+    def write(self: "_ChunkedWriter", data) -> int:
+        data = bytes(data)
+        if data:
+            self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        return len(data)
+
+    def flush(self: "_ChunkedWriter"):
+        self.wfile.flush()
+
+    def close(self: "_ChunkedWriter"):
+        if not self.closed:
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+            self.closed = True
+
+
+class QueryDaemon:
+    """
+    Serves queries from warm runners over a localhost HTTP API.
+    """
+
+    host: str
+    port: int
+
+    def __init__(self: "QueryDaemon", host: str = "127.0.0.1", port: int = 8765):
+        """
+        Initializes a new QueryDaemon object.
+
+        Args:
+            host: The interface to bind to. Only loopback addresses should be used.
+            port: The port to listen on.
+        """
+        self.logger = get_logger(__name__)
+        self.host = host
+        self.port = port
+        self._runners: dict[tuple, DBConnectionRunner] = {}
+        self._runner_locks: dict[tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._reports: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._token = secrets.token_urlsafe(32)
+
+    def _get_runner(
+        self: "QueryDaemon", environment: str, connections: list[str]
+    ) -> tuple[DBConnectionRunner, threading.Lock]:
+        """
+        Returns the warm runner for an environment and connection set,
+        creating it on first use.
+        """
+        key = (environment, tuple(sorted(connections or [])))
+        with self._lock:
+            if key not in self._runners:
+                self.logger.info(f"Warming runner for {environment}: {key[1] or 'all'}")
+                self._runners[key] = DBConnectionRunner(environment, list(key[1]))
+                self._runner_locks[key] = threading.Lock()
+
+            return self._runners[key], self._runner_locks[key]
+
+    def run_query(
+        self: "QueryDaemon", request: dict[str, Any]
+    ) -> tuple[str, pd.DataFrame]:
+        """
+        Runs a query request on a warm runner and records its report.
+
+        Args:
+            request: The decoded JSON body of a `/query` request.
+
+        Returns:
+            The run id and the resulting DataFrame.
+        """
+        runner, runner_lock = self._get_runner(
+            request.get("environment", "staging"), request.get("connections") or []
+        )
+        run_id = uuid.uuid4().hex
+        start = time.time()
+        with runner_lock:
+            df = runner.execute_query_multi_db(
+                request["query"],
+                request.get("commit", False),
+                request.get("ignore_cache", False),
+            )
+            if isinstance(df, SpilledResult):
+                # The spill files are deleted once streamed, so the cache
+                # writer must be done with them first.
+                runner.cache.flush()
+            failed = {
+                connection: str(error)
+                for connection, error in runner.failed_extractions.items()
+            }
+
+        report = {
+            "run_id": run_id,
+            "query": request["query"],
+            "environment": runner.environment,
+            "connections": list(runner.connections),
+            "rows": len(df),
+            "columns": list(map(str, df.columns)),
+            "failed_extractions": failed,
+            "started_at": start,
+            "elapsed": time.time() - start,
+        }
+        with self._lock:
+            self._reports[run_id] = report
+            while len(self._reports) > MAX_REPORTS:
+                self._reports.popitem(last=False)
+
+        return run_id, df
+
+    def get_report(self: "QueryDaemon", run_id: str) -> Optional[dict[str, Any]]:
+        with self._lock:
+            return self._reports.get(run_id)
+
+    def _make_handler(self: "QueryDaemon"):
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                daemon.logger.debug(format % args)
+
+            def _send_json(self, status: int, payload: dict[str, Any]):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _authorized(self) -> bool:
+                """
+                Checks the token and Host headers, answering the request
+                when they are wrong.
+                """
+                hosts = {
+                    f"{name}:{daemon.port}"
+                    for name in ("127.0.0.1", "localhost", daemon.host)
+                }
+                if self.headers.get("Host") not in hosts:
+                    self._send_json(403, {"error": "Invalid Host header"})
+                    return False
+
+                token = self.headers.get(TOKEN_HEADER, "")
+                if not hmac.compare_digest(token.encode(), daemon._token.encode()):
+                    self._send_json(401, {"error": "Invalid daemon token"})
+                    return False
+
+                return True
+
+            def do_GET(self):
+                if not self._authorized():
+                    return
+
+                if self.path == "/health":
+                    self._send_json(200, {"status": "ok", "pid": os.getpid()})
+                elif self.path.startswith("/reports/"):
+                    report = daemon.get_report(self.path.removeprefix("/reports/"))
+                    if report is None:
+                        self._send_json(404, {"error": "Unknown run id"})
+                    else:
+                        self._send_json(200, report)
+                else:
+                    self._send_json(404, {"error": "Not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length) if length else b""
+
+                if not self._authorized():
+                    return
+                content_type = self.headers.get("Content-Type", "")
+                if content_type.split(";")[0].strip().lower() != "application/json":
+                    self._send_json(415, {"error": "Expected application/json"})
+                    return
+
+                if self.path == "/shutdown":
+                    self._send_json(200, {"status": "stopping"})
+                    threading.Thread(target=daemon.stop, daemon=True).start()
+                    return
+
+                if self.path != "/query":
+                    self._send_json(404, {"error": "Not found"})
+                    return
+
+                try:
+                    run_id, df = daemon.run_query(json.loads(body))
+                    if isinstance(df, SpilledResult):
+                        reader = df.to_arrow_reader()
+                    else:
+                        table = pa.Table.from_pandas(df, preserve_index=False)
+                        reader = pa.RecordBatchReader.from_batches(
+                            table.schema, table.to_batches(max_chunksize=64_000)
+                        )
+                except Exception as e:
+                    daemon.logger.error(f"Daemon query failed: {e}")
+                    self._send_json(400, {"error": str(e)})
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/vnd.apache.arrow.stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.send_header("X-Run-Id", run_id)
+                self.end_headers()
+
+                writer = _ChunkedWriter(self.wfile)
+                try:
+                    with pa.ipc.new_stream(writer, reader.schema) as stream:
+                        for batch in reader:
+                            stream.write_batch(batch)
+                    writer.close()
+                finally:
+                    if isinstance(df, SpilledResult):
+                        df.cleanup()
+
+        return Handler
+
+    def serve_forever(self: "QueryDaemon"):
+        """
+        Starts serving and blocks until the daemon is stopped.
+        """
+        self._server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self.port = self._server.server_address[1]
+
+        DAEMON_STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        # Recreated rather than truncated, so a state file left with looser
+        # permissions never holds the new token.
+        DAEMON_STATE_PATH.unlink(missing_ok=True)
+        fd = os.open(DAEMON_STATE_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "host": self.host,
+                    "port": self.port,
+                    "pid": os.getpid(),
+                    "token": self._token,
+                },
+                f,
+            )
+
+        self.logger.info(f"Daemon listening on {self.host}:{self.port}")
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            DAEMON_STATE_PATH.unlink(missing_ok=True)
+            for runner in self._runners.values():
+                runner.close_all()
+            self.logger.info("Daemon stopped")
+
+    def stop(self: "QueryDaemon"):
+        if self._server is not None:
+            self._server.shutdown()
+
+
+class DaemonClient:
+    """
+    Submits queries to a running `QueryDaemon`.
+    """
+
+    host: str
+    port: int
+
+    def __init__(
+        self: "DaemonClient",
+        host: str,
+        port: int,
+        token: str,
+        timeout: float = 3600,
+    ):
+        self.host = host
+        self.port = port
+        self.token = token
+        self.timeout = timeout
+
+    @classmethod
+    def find(cls) -> Optional["DaemonClient"]:
+        """
+        Returns a client for the running daemon, or None if there is none or
+        whatever listens on its advertised port does not answer as it would.
+        """
+        if not DAEMON_STATE_PATH.exists():
+            return None
+
+        try:
+            with open(DAEMON_STATE_PATH, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            client = cls(state["host"], state["port"], state["token"])
+            client._request("GET", "/health", timeout=1).read()
+            return client
+        except (OSError, ValueError, KeyError, http.client.HTTPException, DaemonError):
+            return None
+
+    def _request(
+        self: "DaemonClient",
+        method: str,
+        path: str,
+        body: Optional[dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> http.client.HTTPResponse:
+        conn = http.client.HTTPConnection(
+            self.host, self.port, timeout=timeout or self.timeout
+        )
+        payload = json.dumps(body if body is not None else {}).encode()
+        headers = {TOKEN_HEADER: self.token}
+        if method == "POST":
+            headers["Content-Type"] = "application/json"
+        else:
+            payload = None
+        conn.request(method, path, body=payload, headers=headers)
+        response = conn.getresponse()
+        if response.status != 200:
+            error = json.loads(response.read() or b"{}").get("error", response.reason)
+            raise DaemonError(f"Daemon request failed: {error}")
+
+        return response
+
+    def execute_query(
+        self: "DaemonClient",
+        environment: str,
+        connections: Optional[list[str]],
+        query: str,
+        commit: bool = False,
+        ignore_cache: bool = False,
+    ) -> tuple[str, pd.DataFrame]:
+        """
+        Runs a query on the daemon.
+
+        Returns:
+            The run id and the resulting DataFrame.
+        """
+        response = self._request(
+            "POST",
+            "/query",
+            {
+                "environment": environment,
+                "connections": connections,
+                "query": query,
+                "commit": commit,
+                "ignore_cache": ignore_cache,
+            },
+        )
+        run_id = response.getheader("X-Run-Id")
+        table = pa.ipc.open_stream(pa.PythonFile(response, mode="r")).read_all()
+
+        return run_id, table.to_pandas()
+
+    def get_report(self: "DaemonClient", run_id: str) -> dict[str, Any]:
+        return json.loads(self._request("GET", f"/reports/{run_id}").read())
+
+    def shutdown(self: "DaemonClient"):
+        self._request("POST", "/shutdown").read()
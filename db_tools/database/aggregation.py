@@ -0,0 +1,194 @@
+import re
+from typing import Optional
+
+import pandas as pd
+
+AGGREGATE_FUNCTIONS = ["sum", "count", "min", "max", "avg", "count_distinct"]
+
+# Aliases of generated SQL start with a letter: unquoted Oracle identifiers
+# cannot start with an underscore.
+SUBQUERY_ALIAS = "src"
+
+
+def strip_query(query: str) -> str:
+    """
+    Removes trailing whitespace and semicolons so a query can be wrapped as a
+    subquery.
+    """
+    return query.strip().rstrip(";").strip()
+
+
+class Aggregate:
+    """
+    A single aggregate requested by the user, e.g. `sum:amount` or `count:*`.
+    """
+
+    function: str
+    column: str
+
+    def __init__(self: "Aggregate", spec: str):
+        """
+        Initializes a new Aggregate object.
+
+        Args:
+            spec: The aggregate as `function:column`.
+        """
+        function, sep, column = spec.partition(":")
+        function = function.strip().lower()
+        column = column.strip()
+
+        if not sep or not column:
+            raise ValueError(f"Invalid aggregate '{spec}'! Expected function:column.")
+        if function not in AGGREGATE_FUNCTIONS:
+            raise ValueError(
+                f"Unknown aggregate function '{function}'! "
+                f"Available: {', '.join(AGGREGATE_FUNCTIONS)}"
+            )
+        if column == "*" and function != "count":
+            raise ValueError(f"'*' is only valid for count, not {function}!")
+
+        self.function = function
+        self.column = column
+
+    @property
+    def name(self: "Aggregate") -> str:
+        """
+        The output column name, e.g. `sum_amount` or `count_all`.
+        """
+        column = "all" if self.column == "*" else self.column
+        column = re.sub(r"\W+", "_", column).strip("_")
+        return f"{self.function}_{column}"
+
+
+class AggregationPlan:
+    """
+    Rewrites a query into per-connection partial aggregates and merges the
+    partials centrally.
+
+    Sum, count, min and max push down directly; avg is shipped as a partial
+    sum and count. count_distinct cannot be combined from per-shard counts,
+    so it ships the distinct (group, value) pairs instead, which still keeps
+    the transfer proportional to the number of distinct values.
+    """
+
+    group_by: list[str]
+    aggregates: list[Aggregate]
+
+    def __init__(self: "AggregationPlan", group_by: list[str], aggregates: list[str]):
+        """
+        Initializes a new AggregationPlan object.
+
+        Args:
+            group_by: The group-by key columns.
+            aggregates: The aggregates as `function:column` strings.
+        """
+        if not aggregates:
+            raise ValueError("At least one aggregate is required!")
+
+        self.group_by = list(group_by or [])
+        self.aggregates = [Aggregate(spec) for spec in aggregates]
+
+    def _wrap(
+        self: "AggregationPlan",
+        query: str,
+        select: list[str],
+        group_by: list[str],
+    ) -> str:
+        sql = f"SELECT {', '.join(select)} FROM ({strip_query(query)}) {SUBQUERY_ALIAS}"
+        if group_by:
+            sql += f" GROUP BY {', '.join(group_by)}"
+        return sql
+
+    def partial_queries(self: "AggregationPlan", query: str) -> dict[str, str]:
+        """
+        Builds the queries each connection runs.
+
+        Args:
+            query: The user's query.
+
+        Returns:
+            A dictionary of partial name to SQL. The `partials` entry holds the
+            decomposable aggregates; `distinct:<column>` entries hold the
+            distinct pairs needed by each count_distinct.
+        """
+        select = list(self.group_by)
+        for i, aggregate in enumerate(self.aggregates):
+            column = aggregate.column
+            if aggregate.function == "avg":
+                select.append(f"SUM({column}) AS p{i}_sum")
+                select.append(f"COUNT({column}) AS p{i}_count")
+            elif aggregate.function != "count_distinct":
+                select.append(f"{aggregate.function.upper()}({column}) AS p{i}")
+
+        queries = {}
+        if len(select) > len(self.group_by):
+            queries["partials"] = self._wrap(query, select, self.group_by)
+
+        for aggregate in self.aggregates:
+            if aggregate.function == "count_distinct":
+                columns = self.group_by + [f"{aggregate.column} AS distinct_value"]
+                queries[f"distinct:{aggregate.column}"] = self._wrap(
+                    query, columns, self.group_by + [aggregate.column]
+                )
+
+        return queries
+
+    def merge(
+        self: "AggregationPlan",
+        partials: dict[str, pd.DataFrame],
+        connection_column: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """
+        Merges the partial results of every connection.
+
+        Args:
+            partials: The combined result of each partial query.
+            connection_column: The connection tag column to drop, if present.
+
+        Returns:
+            One row per group with one column per aggregate.
+        """
+        keys = self.group_by
+        frames = {
+            name: df.drop(columns=[connection_column], errors="ignore")
+            for name, df in partials.items()
+        }
+
+        merged = None
+        if "partials" in frames:
+            df = frames["partials"]
+            grouped = df.groupby(keys, dropna=False) if keys else None
+
+            def _combine(column: str, how: str) -> pd.Series:
+                if grouped is None:
+                    return pd.Series([getattr(df[column], how)()])
+                return getattr(grouped[column], how)()
+
+            columns = {}
+            for i, aggregate in enumerate(self.aggregates):
+                if aggregate.function == "avg":
+                    columns[aggregate.name] = _combine(f"p{i}_sum", "sum") / _combine(
+                        f"p{i}_count", "sum"
+                    )
+                elif aggregate.function in ["sum", "count"]:
+                    columns[aggregate.name] = _combine(f"p{i}", "sum")
+                elif aggregate.function in ["min", "max"]:
+                    columns[aggregate.name] = _combine(f"p{i}", aggregate.function)
+
+            merged = pd.DataFrame(columns)
+
+        for aggregate in self.aggregates:
+            if aggregate.function != "count_distinct":
+                continue
+
+            df = frames[f"distinct:{aggregate.column}"]
+            if keys:
+                counts = df.groupby(keys, dropna=False)["distinct_value"].nunique()
+            else:
+                counts = pd.Series([df["distinct_value"].nunique()])
+            counts = counts.rename(aggregate.name)
+
+            merged = counts.to_frame() if merged is None else merged.join(counts)
+
+        merged = merged.reset_index() if keys else merged.reset_index(drop=True)
+        return merged[keys + [aggregate.name for aggregate in self.aggregates]]
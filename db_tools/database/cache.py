@@ -0,0 +1,631 @@
+import atexit
+import hashlib
+import json
+import os
+import pickle
+import queue
+import socket
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from ..logger import get_logger
+from ..profiling import stage
+from .spill import SpilledResult
+
+CACHE_FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+SWEEP_LEASE = "objects-sweep"
+
+
+def _checksum(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _tmp_path(path: Path) -> Path:
+    # Unique per writer, so processes sharing the cache never write the same
+    # temporary file.
+    return path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+
+
+def _write_atomic(path: Path, payload: bytes):
+    tmp_path = _tmp_path(path)
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name != "posix":
+        # os.kill would terminate the process on Windows.
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ResultCache:
+    """
+    Stores combined query results on disk, keyed by run hash.
+
+    Results are submitted to a background writer through a bounded queue,
+    so callers get their result as soon as it is fetched. Each file is
+    written to a temporary path and renamed into place, and a manifest with
+    its size and checksum is committed last; entries without a valid
+    manifest are treated as misses, so a crash never leaves a truncated
+    file that later "hits".
+
+    Data files are content-addressed: they are stored under `objects/` by
+    checksum and manifests point at them, so identical results of different
+    queries share one file. Objects no manifest points at any more are swept
+    once they are older than a grace period. In shared mode, for a cache directory several
+    processes or users point at, a lease file makes concurrent identical
+    runs single-flight: the first run executes the query and the others wait
+    for its entry.
+
+    Two formats are supported. Parquet is compact but every hit decodes the
+    whole file. Arrow IPC (Feather v2) files are memory-mapped, so a hit only
+    touches the columns and rows that are actually read; without compression
+    they are read without any copy at all.
+    """
+
+    root: Path
+    format: str
+    compression: Optional[str]
+    verify: bool
+    shared: bool
+    lease_timeout: float
+    sweep_grace: float
+
+    def __init__(
+        self: "ResultCache",
+        root: Path,
+        format: str = "parquet",
+        compression: Optional[str] = None,
+        queue_size: int = 2,
+        verify: bool = False,
+        shared: bool = False,
+        lease_timeout: float = 3600,
+        sweep_grace: float = 600,
+    ):
+        """
+        Initializes a new ResultCache object.
+
+        Args:
+            root: The cache directory.
+            format: The format new entries are written in: parquet or arrow.
+            compression: The Arrow IPC compression (zstd or lz4), if any.
+                Parquet always uses its default compression.
+            queue_size: How many results may wait for the background writer
+                before `submit` blocks.
+            verify: Whether to check the full checksum on every hit. The
+                file size is always checked.
+            shared: Whether concurrent identical runs are coalesced through
+                lease files.
+            lease_timeout: Seconds after which a lease is considered
+                abandoned.
+            sweep_grace: Seconds an unreferenced object is kept, so writers
+                that have not committed their manifest yet never lose it.
+        """
+        if format not in CACHE_FORMATS:
+            raise ValueError(f"Invalid cache format '{format}'!")
+        if compression in ("", "none"):
+            compression = None
+        if compression not in (None, "zstd", "lz4"):
+            raise ValueError(f"Invalid cache compression '{compression}'!")
+
+        self.logger = get_logger(__name__)
+        self.root = Path(root)
+        self.format = format
+        self.compression = compression
+        self.verify = verify
+        self.shared = shared
+        self.lease_timeout = lease_timeout
+        self.sweep_grace = sweep_grace
+        self._leases: set[str] = set()
+        self._queue: queue.Queue = queue.Queue(maxsize=max(queue_size, 1))
+        self._pending: dict[str, tuple[Any, dict[str, Any]]] = {}
+        self._pending_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def _manifest_path(self: "ResultCache", run_hash: str) -> Path:
+        return self.root / f"{run_hash}.manifest.json"
+
+    def _find(self: "ResultCache", run_hash: str) -> Optional[Path]:
+        """
+        Returns the committed file of a run, or None if there is none or it
+        does not match its manifest.
+        """
+        manifest_path = self._manifest_path(run_hash)
+        if not manifest_path.exists():
+            return None
+
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            path = self.root / manifest["file"]
+            valid = path.exists() and path.stat().st_size == manifest["size"]
+            if valid and self.verify:
+                valid = _checksum(path) == manifest["sha256"]
+        except (OSError, KeyError, json.JSONDecodeError):
+            valid = False
+
+        if not valid:
+            self.logger.warning(f"Discarding corrupt cache entry {run_hash}")
+            self.invalidate(run_hash)
+            return None
+
+        return path
+
+    def invalidate(self: "ResultCache", run_hash: str):
+        """
+        Deletes a cache entry. Its data file may be shared with other entries,
+        so it is only removed by the sweep once nothing points at it.
+        """
+        paths = [self._manifest_path(run_hash), self.root / f"{run_hash}.pkl"]
+        paths += [
+            self.root / f"{run_hash}{suffix}" for suffix in CACHE_FORMATS.values()
+        ]
+        for path in paths:
+            path.unlink(missing_ok=True)
+
+        self.sweep()
+
+    def sweep(self: "ResultCache"):
+        """
+        Deletes the objects (and abandoned temporary files) that no manifest
+        points at and that are older than `sweep_grace`.
+
+        Runs under its own lease, so only one process sweeps a shared cache
+        at a time. The grace period covers writers between storing an object
+        and committing its manifest, as they refresh the object's mtime.
+        """
+        objects = self.root / "objects"
+        if not objects.exists() or not self.acquire(SWEEP_LEASE):
+            return
+
+        try:
+            referenced = set()
+            for manifest_path in self.root.glob("*.manifest.json"):
+                try:
+                    with open(manifest_path, "r", encoding="utf-8") as f:
+                        referenced.add(json.load(f)["file"])
+                except (OSError, KeyError, json.JSONDecodeError):
+                    continue
+
+            now = time.time()
+            removed = 0
+            for path in objects.iterdir():
+                if path.relative_to(self.root).as_posix() in referenced:
+                    continue
+                try:
+                    if now - path.stat().st_mtime > self.sweep_grace:
+                        path.unlink()
+                        removed += 1
+                except OSError:
+                    # Gone already, or still open by a reader on Windows.
+                    continue
+
+            if removed:
+                self.logger.info(f"Swept {removed} unreferenced cache object(s)")
+        finally:
+            self.release(SWEEP_LEASE)
+
+    def _lease_path(self: "ResultCache", run_hash: str) -> Path:
+        return self.root / f"{run_hash}.lease"
+
+    def _lease_stale(self: "ResultCache", path: Path) -> bool:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                lease = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, json.JSONDecodeError):
+            # A lease being written is empty for a moment; only give up on
+            # it once it is old.
+            try:
+                return time.time() - path.stat().st_mtime > self.lease_timeout
+            except FileNotFoundError:
+                return False
+
+        if time.time() - lease["started_at"] > self.lease_timeout:
+            return True
+        return lease["host"] == socket.gethostname() and not _pid_alive(lease["pid"])
+
+    def acquire(self: "ResultCache", run_hash: str) -> bool:
+        """
+        Tries to take the lease of a run.
+
+        Args:
+            run_hash: The cache key of the run.
+
+        Returns:
+            True if this process now holds the lease.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self._lease_path(run_hash)
+        if self._lease_stale(path):
+            self.logger.warning(f"Breaking abandoned cache lease {path.name}")
+            path.unlink(missing_ok=True)
+
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o664)
+        except FileExistsError:
+            return False
+
+        lease = {
+            "pid": os.getpid(),
+            "host": socket.gethostname(),
+            "started_at": time.time(),
+        }
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(lease, f)
+        self._leases.add(run_hash)
+
+        return True
+
+    def release(self: "ResultCache", run_hash: str):
+        """
+        Releases the lease of a run, if this process holds it.
+        """
+        if run_hash in self._leases:
+            self._leases.discard(run_hash)
+            self._lease_path(run_hash).unlink(missing_ok=True)
+
+    def release_all(self: "ResultCache"):
+        """
+        Releases every lease this process holds.
+        """
+        for run_hash in list(self._leases):
+            self.release(run_hash)
+
+    def single_flight(
+        self: "ResultCache", run_hash: str, poll: float = 1.0
+    ) -> Optional[tuple[pd.DataFrame, dict[str, Any]]]:
+        """
+        Coalesces concurrent identical runs in shared mode.
+
+        Either takes the run's lease, in which case the caller must run the
+        query and cache its result (which releases the lease), or waits for
+        the process holding it and returns the entry it committed.
+
+        Args:
+            run_hash: The cache key of the run.
+            poll: Seconds between checks while waiting.
+
+        Returns:
+            The cached result, or None if the caller must run the query.
+        """
+        if not self.shared:
+            return None
+
+        waiting = False
+        while not self.acquire(run_hash):
+            if not waiting:
+                self.logger.info("Identical run in progress, waiting for its result")
+                waiting = True
+            time.sleep(poll)
+
+        # The previous holder may have committed just before releasing.
+        cached = self.read(run_hash)
+        if cached is not None:
+            self.release(run_hash)
+        return cached
+
+    def submit(
+        self: "ResultCache",
+        run_hash: str,
+        df: Union[pd.DataFrame, SpilledResult],
+        failed_extractions: dict[str, Any],
+        on_commit: Optional[Callable[[], None]] = None,
+    ):
+        """
+        Queues a result to be cached by the background writer.
+
+        Blocks while the queue is full, which bounds how many results are
+        held in memory only for the cache. Until the entry is committed,
+        reads of the same run are served from the queued result.
+
+        Args:
+            run_hash: The cache key of the run.
+            df: The result to cache.
+            failed_extractions: The errors of the run.
+            on_commit: Called by the writer once the entry is committed.
+        """
+        if isinstance(df, pd.DataFrame):
+            # A shallow copy keeps columns the caller reassigns out of the
+            # queued result.
+            df = df.copy(deep=False)
+
+        with self._pending_lock:
+            self._pending[run_hash] = (df, failed_extractions)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+                atexit.register(self.release_all)
+
+        with stage("cache_queue_wait"):
+            self._queue.put((run_hash, df, failed_extractions, on_commit))
+
+    def flush(self: "ResultCache"):
+        """
+        Waits until every queued result is committed.
+        """
+        if self._thread is not None:
+            self._queue.join()
+
+    def _worker(self: "ResultCache"):
+        while True:
+            run_hash, df, failed_extractions, on_commit = self._queue.get()
+            try:
+                with stage("cache_write"):
+                    self.write(run_hash, df, failed_extractions)
+                if on_commit is not None:
+                    on_commit()
+            except Exception as e:
+                self.logger.error(f"Could not cache result {run_hash}: {e}")
+            finally:
+                with self._pending_lock:
+                    if self._pending.get(run_hash, (None,))[0] is df:
+                        del self._pending[run_hash]
+                self.release(run_hash)
+                self._queue.task_done()
+
+    def write(
+        self: "ResultCache",
+        run_hash: str,
+        df: Union[pd.DataFrame, SpilledResult],
+        failed_extractions: dict[str, Any],
+    ):
+        """
+        Caches a result and the errors of its run, synchronously.
+
+        Args:
+            run_hash: The cache key of the run.
+            df: The result to cache.
+            failed_extractions: The errors of the run.
+        """
+        objects = self.root / "objects"
+        objects.mkdir(parents=True, exist_ok=True)
+        suffix = CACHE_FORMATS[self.format]
+        tmp_path = _tmp_path(objects / f"{run_hash}{suffix}")
+
+        # The old manifest goes first, so a crash mid-write leaves a miss.
+        self._manifest_path(run_hash).unlink(missing_ok=True)
+
+        if self.format == "parquet":
+            # Both DataFrames and SpilledResults are written here, the latter
+            # batch by batch.
+            df.to_parquet(tmp_path)
+        else:
+            if isinstance(df, SpilledResult):
+                reader = df.to_arrow_reader()
+            else:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                reader = pa.RecordBatchReader.from_batches(
+                    table.schema, table.to_batches()
+                )
+            options = pa.ipc.IpcWriteOptions(compression=self.compression)
+            with pa.OSFile(str(tmp_path), "wb") as sink:
+                with pa.ipc.new_file(sink, reader.schema, options=options) as writer:
+                    for batch in reader:
+                        writer.write_batch(batch)
+
+        checksum = _checksum(tmp_path)
+        path = objects / f"{checksum}{suffix}"
+        if path.exists() and path.stat().st_size == tmp_path.stat().st_size:
+            self.logger.info(f"Result already cached as {path.name}, reusing it")
+            tmp_path.unlink()
+            # Fresh again, so a sweep cannot take it before the manifest
+            # below points at it.
+            os.utime(path)
+        else:
+            os.replace(tmp_path, path)
+
+        _write_atomic(self.root / f"{run_hash}.pkl", pickle.dumps(failed_extractions))
+        manifest = {
+            "file": path.relative_to(self.root).as_posix(),
+            "size": path.stat().st_size,
+            "sha256": checksum,
+        }
+        _write_atomic(
+            self._manifest_path(run_hash), json.dumps(manifest, indent=2).encode()
+        )
+
+        # The object the previous manifest pointed at may now be orphaned.
+        self.sweep()
+
+    def read(
+        self: "ResultCache",
+        run_hash: str,
+        columns: Optional[list[str]] = None,
+        rows: Optional[int] = None,
+        group_column: Optional[str] = None,
+    ) -> Optional[tuple[pd.DataFrame, dict[str, Any]]]:
+        """
+        Reads a cached result, optionally only some of its columns and rows.
+
+        Args:
+            run_hash: The cache key of the run.
+            columns: The columns to read, or None for all.
+            rows: The maximum number of rows to read, or None for all.
+            group_column: When given, `rows` applies to each value of this
+                column (e.g. per connection) instead of the whole result.
+
+        Returns:
+            The cached DataFrame and the errors of its run, or None on a miss.
+        """
+        with self._pending_lock:
+            pending = self._pending.get(run_hash)
+        if pending is not None:
+            df, failed_extractions = pending
+            if isinstance(df, SpilledResult):
+                # Loading a spilled result whole would defeat the memory
+                # budget, so only bounded reads are served before it is
+                # committed.
+                if rows is None:
+                    return None
+                return df.head(rows, columns, group_column), failed_extractions
+            return self._project_frame(df, columns, rows, group_column), (
+                failed_extractions
+            )
+
+        path = self._find(run_hash)
+        if path is None:
+            return None
+
+        if path.suffix == CACHE_FORMATS["arrow"]:
+            df = self._read_arrow(path, columns, rows, group_column)
+        elif rows is None:
+            df = pd.read_parquet(path, columns=columns)
+        else:
+            table = pq.read_table(path, columns=self._with(columns, group_column))
+            df = self._project(table, columns, rows, group_column).to_pandas()
+
+        failed_extractions = {}
+        if (self.root / f"{run_hash}.pkl").exists():
+            with open(self.root / f"{run_hash}.pkl", "rb") as f:
+                failed_extractions = pickle.load(f)
+
+        return df, failed_extractions
+
+    def _read_arrow(
+        self: "ResultCache",
+        path: Path,
+        columns: Optional[list[str]],
+        rows: Optional[int],
+        group_column: Optional[str],
+    ) -> pd.DataFrame:
+        """
+        Reads an Arrow IPC file, decoding only the requested columns and only
+        the record batches that hold the requested rows.
+        """
+        with pa.memory_map(str(path), "r") as source:
+            reader = pa.ipc.open_file(source)
+            names = reader.schema.names
+            fields = self._with(columns, group_column if rows is not None else None)
+            if fields is not None:
+                reader = pa.ipc.open_file(
+                    source,
+                    options=pa.ipc.IpcReadOptions(
+                        included_fields=[names.index(c) for c in fields if c in names]
+                    ),
+                )
+
+            batches = range(reader.num_record_batches)
+            if rows is not None:
+                batches = self._arrow_batches(source, reader, names, rows, group_column)
+            table = pa.Table.from_batches(
+                [reader.get_batch(i) for i in batches], schema=reader.schema
+            )
+
+            return self._project(table, columns, rows, group_column).to_pandas()
+
+    @staticmethod
+    def _arrow_batches(
+        source: pa.MemoryMappedFile,
+        reader: pa.ipc.RecordBatchFileReader,
+        names: list[str],
+        rows: int,
+        group_column: Optional[str],
+    ) -> list[int]:
+        """
+        Returns the indices of the record batches holding the first `rows`
+        rows, or the first `rows` rows of each group. Only the group column is
+        decoded to find them.
+        """
+        if group_column is None or group_column not in names:
+            batches, total = [], 0
+            for i in range(reader.num_record_batches):
+                if total >= rows:
+                    break
+                batches.append(i)
+                total += reader.get_batch(i).num_rows
+            return batches
+
+        groups_reader = pa.ipc.open_file(
+            source,
+            options=pa.ipc.IpcReadOptions(included_fields=[names.index(group_column)]),
+        )
+        seen: Counter = Counter()
+        batches = []
+        for i in range(groups_reader.num_record_batches):
+            groups = groups_reader.get_batch(i).column(0)
+            if pa.types.is_dictionary(groups.type):
+                groups = pc.cast(groups, groups.type.value_type)
+            counts = pc.value_counts(groups).to_pylist()
+            if any(seen[count["values"]] < rows for count in counts):
+                batches.append(i)
+            for count in counts:
+                seen[count["values"]] += count["counts"]
+
+        return batches
+
+    @staticmethod
+    def _project_frame(
+        df: pd.DataFrame,
+        columns: Optional[list[str]],
+        rows: Optional[int],
+        group_column: Optional[str],
+    ) -> pd.DataFrame:
+        if rows is not None:
+            if group_column is not None and group_column in df.columns:
+                df = df.groupby(group_column, observed=True, sort=False).head(rows)
+            else:
+                df = df.head(rows)
+        if columns is not None:
+            df = df[columns]
+
+        return df.copy()
+
+    @staticmethod
+    def _with(
+        columns: Optional[list[str]], column: Optional[str]
+    ) -> Optional[list[str]]:
+        if columns is None or column is None or column in columns:
+            return columns
+        return columns + [column]
+
+    def _project(
+        self: "ResultCache",
+        table: pa.Table,
+        columns: Optional[list[str]],
+        rows: Optional[int],
+        group_column: Optional[str],
+    ) -> pa.Table:
+        """
+        Selects columns and rows of a table without touching the other ones.
+        """
+        if rows is not None:
+            if group_column is not None and group_column in table.column_names:
+                groups = table[group_column]
+                if pa.types.is_dictionary(groups.type):
+                    groups = pc.cast(groups, groups.type.value_type)
+                indices = [
+                    pc.indices_nonzero(pc.equal(groups, value))[:rows]
+                    for value in pc.unique(groups)
+                ]
+                table = table.take(pa.concat_arrays(indices)) if indices else table
+            else:
+                table = table.slice(0, rows)
+
+        if columns is not None:
+            table = table.select(columns)
+
+        return table
@@ -0,0 +1,147 @@
+from typing import Any, Iterable
+
+import pandas as pd
+
+from ..logger import get_logger
+
+ARROW_STRING = pd.StringDtype("pyarrow")
+
+
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converts a frame to compact, nullable dtypes.
+
+    Integers stay integers when NULLs are present (instead of being upcast
+    to float), object columns holding strings become Arrow-backed strings and
+    other object columns are inferred where possible.
+
+    Args:
+        df: The frame to convert.
+
+    Returns:
+        The converted frame.
+    """
+    df = df.convert_dtypes()
+    string_columns = [
+        column
+        for column, dtype in df.dtypes.items()
+        if isinstance(dtype, pd.StringDtype) and dtype != ARROW_STRING
+    ]
+    if string_columns:
+        df[string_columns] = df[string_columns].astype(ARROW_STRING)
+
+    return df
+
+
+def widen_dtype(a: Any, b: Any) -> Any:
+    """
+    Returns a dtype that can hold values of both `a` and `b`.
+
+    Mixed integer and float columns widen to nullable floats; any other
+    disagreement falls back to object.
+    """
+    if a == b:
+        return a
+
+    numeric = [
+        pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+        for dtype in (a, b)
+    ]
+    if all(numeric):
+        if pd.api.types.is_float_dtype(a) or pd.api.types.is_float_dtype(b):
+            return pd.Float64Dtype()
+        return pd.Int64Dtype()
+
+    return object
+
+
+class SchemaUnifier:
+    """
+    Unifies the dtypes of per-connection frames as they arrive.
+
+    The target dtype of each column is taken from the first frame where the
+    column has data and is only widened when a later frame needs it (e.g.
+    Int64 and Float64 become Float64). Each frame is cast once on arrival;
+    only frames that arrived before a widening are cast again at the end.
+    """
+
+    target: dict[Any, Any]
+
+    def __init__(self: "SchemaUnifier"):
+        """
+        Initializes a new SchemaUnifier object.
+        """
+        self.logger = get_logger(__name__)
+        self.target = {}
+
+    def unify(self: "SchemaUnifier", df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Converts an arriving frame to the target schema, widening it if needed.
+
+        Args:
+            df: The frame of one connection.
+
+        Returns:
+            The frame cast to the current target schema.
+        """
+        df = compact_dtypes(df)
+
+        casts = {}
+        for column, dtype in df.dtypes.items():
+            if df[column].isna().all():
+                # An all-NULL column carries no type information.
+                if column in self.target:
+                    casts[column] = self.target[column]
+                continue
+
+            target = self.target.get(column)
+            if target is None:
+                self.target[column] = dtype
+            elif dtype != target:
+                common = widen_dtype(target, dtype)
+                if common != target:
+                    self.logger.info(
+                        f"Widening column '{column}' from {target} to {common}"
+                    )
+                    self.target[column] = common
+                casts[column] = common
+
+        return self._cast(df, casts)
+
+    def _cast(
+        self: "SchemaUnifier", df: pd.DataFrame, casts: dict[Any, Any]
+    ) -> pd.DataFrame:
+        for column, dtype in casts.items():
+            if df[column].dtype == dtype:
+                continue
+            try:
+                df[column] = df[column].astype(dtype)
+            except (TypeError, ValueError):
+                self.logger.warning(
+                    f"Could not cast column '{column}' to {dtype}, using object"
+                )
+                self.target[column] = object
+                df[column] = df[column].astype(object)
+
+        return df
+
+    def concat(self: "SchemaUnifier", frames: Iterable[pd.DataFrame]) -> pd.DataFrame:
+        """
+        Concatenates unified frames, re-casting any that predate a widening.
+
+        Args:
+            frames: The unified frames of every connection.
+
+        Returns:
+            The combined frame.
+        """
+        aligned = []
+        for df in frames:
+            casts = {
+                column: self.target[column]
+                for column in df.columns
+                if column in self.target and df[column].dtype != self.target[column]
+            }
+            aligned.append(self._cast(df, casts))
+
+        return pd.concat(aligned, ignore_index=True)
@@ -0,0 +1,189 @@
+import json
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from sqlalchemy import exc
+
+from ..logger import get_logger
+from .state import save_state, state_lock
+
+# SQLite and the MySQL drivers raise OperationalError for some statement
+# errors too, which say nothing about the connection.
+STATEMENT_ERROR = re.compile(
+    r"no such (table|column|function)|syntax error|unknown (column|table)"
+    r"|doesn't exist|does not exist|ambiguous column",
+    re.IGNORECASE,
+)
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised in place of a query result when a connection's breaker is open.
+    """
+
+
+def is_connectivity_error(error: BaseException) -> bool:
+    """
+    Returns whether an error means the connection is unhealthy (it could not
+    connect, was dropped or timed out), rather than that the statement was
+    wrong. Only connectivity errors count towards a breaker.
+
+    Wrapping errors (e.g. pandas' DatabaseError, an OSError, around the
+    driver's) are classified by the database error they were raised from.
+    """
+    cause = error
+    while cause is not None and not isinstance(cause, exc.DBAPIError):
+        cause = cause.__cause__
+    if cause is not None:
+        if cause.connection_invalidated:
+            return True
+        if isinstance(cause, (exc.OperationalError, exc.InterfaceError)):
+            return not STATEMENT_ERROR.search(str(cause.orig or cause))
+        return False
+
+    return isinstance(
+        error, (exc.DisconnectionError, exc.TimeoutError, TimeoutError, OSError)
+    )
+
+
+class ConnectionHealthStore:
+    """
+    Persists recent failures and latencies per connection and environment.
+
+    Consecutive failures open a connection's breaker. Once the cooldown has
+    elapsed the breaker is half-open: the next attempt is allowed through and
+    either closes the breaker (success) or re-opens it (failure).
+    """
+
+    path: Path
+    environment: str
+    failure_threshold: int
+    cooldown: float
+    history: int
+
+    def __init__(
+        self: "ConnectionHealthStore",
+        path: Path,
+        environment: str,
+        failure_threshold: int = 3,
+        cooldown: float = 300,
+        history: int = 20,
+    ):
+        """
+        Initializes a new ConnectionHealthStore object.
+
+        Args:
+            path: The JSON file the store is persisted to.
+            environment: The environment the current run targets.
+            failure_threshold: Consecutive failures needed to open a breaker.
+            cooldown: Seconds an open breaker waits before allowing a retry.
+            history: How many recent latencies to keep per connection.
+        """
+        self.logger = get_logger(__name__)
+        self.path = Path(path)
+        self.environment = environment
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.history = history
+        self._lock = threading.Lock()
+        self._changed: set[tuple[str, ...]] = set()
+        self._data = self._load()
+
+    def _load(self: "ConnectionHealthStore") -> dict[str, Any]:
+        """
+        Loads the store from disk, starting empty if it is missing or corrupt.
+        """
+        if not self.path.exists():
+            return {}
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            self.logger.warning(f"Could not read health store {self.path}: {e}")
+            return {}
+
+    def save(self: "ConnectionHealthStore"):
+        """
+        Writes the connections this store recorded to disk, keeping what
+        other stores saved for the rest.
+        """
+        with state_lock(self.path), self._lock:
+            self._data = save_state(self.path, self._data, self._changed)
+            self._changed.clear()
+
+    def _entry(self: "ConnectionHealthStore", connection: str) -> dict[str, Any]:
+        self._changed.add((self.environment, connection))
+        environment = self._data.setdefault(self.environment, {})
+        return environment.setdefault(
+            connection,
+            {"failures": 0, "last_failure": None, "last_error": None, "latencies": []},
+        )
+
+    def record_success(self: "ConnectionHealthStore", connection: str, latency: float):
+        """
+        Records a successful round trip and closes the connection's breaker.
+
+        Args:
+            connection: The connection name.
+            latency: The observed latency in seconds.
+        """
+        with self._lock:
+            entry = self._entry(connection)
+            entry["failures"] = 0
+            entry["latencies"] = (entry["latencies"] + [round(latency, 4)])[
+                -self.history :
+            ]
+
+    def record_failure(
+        self: "ConnectionHealthStore", connection: str, error: Exception
+    ):
+        """
+        Records a failed attempt against a connection.
+
+        Args:
+            connection: The connection name.
+            error: The error raised by the attempt.
+        """
+        with self._lock:
+            entry = self._entry(connection)
+            entry["failures"] += 1
+            entry["last_failure"] = time.time()
+            entry["last_error"] = str(error)[:500]
+
+        if self.is_open(connection):
+            self.logger.warning(f"Circuit breaker open for connection: {connection}")
+
+    def is_open(self: "ConnectionHealthStore", connection: str) -> bool:
+        """
+        Checks whether a connection's breaker is open.
+
+        Args:
+            connection: The connection name.
+
+        Returns:
+            True if the connection should not be attempted right now.
+        """
+        entry = self._data.get(self.environment, {}).get(connection)
+        if entry is None or entry["failures"] < self.failure_threshold:
+            return False
+
+        return time.time() - (entry["last_failure"] or 0) < self.cooldown
+
+    def expected_latency(
+        self: "ConnectionHealthStore", connection: str
+    ) -> Optional[float]:
+        """
+        Returns the mean recent latency of a connection, if any was recorded.
+
+        Args:
+            connection: The connection name.
+        """
+        entry = self._data.get(self.environment, {}).get(connection)
+        if not entry or not entry["latencies"]:
+            return None
+
+        return sum(entry["latencies"]) / len(entry["latencies"])
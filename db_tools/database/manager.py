@@ -9,7 +9,9 @@ from sqlalchemy.engine.create import create_engine
 
 from ..extras import Struct, find_root_dir
 from ..logger import get_logger
+from ..profiling import install_profiling_hooks
 from ..security import SecurityManager
+from .profiles import engine_options, install_profile, resolve_profile
 
 
 class DBConnectionManager:
@@ -17,6 +19,7 @@ class DBConnectionManager:
     Manages database connections.
     """
 
+    environment: str
     configurations: Struct[Any]
     connections: Struct[Any]
     engines: Struct[Engine]
@@ -31,6 +34,7 @@ class DBConnectionManager:
             connections: A list of connection names to manage.
         """
         self.logger = get_logger(__name__)
+        self.environment = environment
         self.security_manager = SecurityManager()
         self.configurations = self._load_config()
         self.connections = self._get_connections()
@@ -167,25 +171,95 @@ class DBConnectionManager:
             host=host,
             port=port,
             database=database,
-            username=username,
+            user=username,
             password=password,
         )
 
     def _create_engines(self: "DBConnectionManager") -> Struct:
         """
-        Creates SQLAlchemy engines for all the connections.
+        Creates SQLAlchemy engines for all the connections, tuned by each
+        connection's performance profile.
 
         Returns:
             A Struct object containing the SQLAlchemy engines.
         """
         engines = Struct()
         for connection, config in self.connections.items():
-            engines[connection] = create_engine(config.connstring)
+            config.performance = resolve_profile(
+                config.type,
+                self.configurations.get("profiles", {}),
+                config.get("profile", {}),
+            )
+            engines[connection] = self._create_engine(config, config.connstring)
 
         self.logger.info(f"Created engines for {len(self.connections)} connections")
 
         return engines
 
+    def _create_engine(
+        self: "DBConnectionManager", config: Struct, connstring: str
+    ) -> Engine:
+        """
+        Creates a SQLAlchemy engine for a connection string, tuned by the
+        connection's performance profile.
+        """
+        engine = create_engine(
+            connstring, **engine_options(config.type, config.performance)
+        )
+        install_profile(engine, config.type, config.performance)
+        install_profiling_hooks(engine)
+
+        return engine
+
+    def replica_hosts(self: "DBConnectionManager", connection: str) -> list[Struct]:
+        """
+        Returns the read replicas of a connection in the current environment.
+
+        Replicas are listed under the environment's `replicas` key, either as
+        host names or as tables overriding `host`, `port`, `database`,
+        `username` and `password`.
+        A connection's `replica` table is also a replica of `production`.
+
+        Args:
+            connection: The connection name.
+
+        Returns:
+            One Struct per replica, with the environment's settings merged in.
+        """
+        config = self.connections[connection]
+        environment = config.get(self.environment) or Struct()
+
+        entries = list(environment.get("replicas", []))
+        if self.environment == "production" and config.get("replica"):
+            entries.append(config.replica)
+
+        replicas = []
+        for entry in entries:
+            if isinstance(entry, str):
+                entry = {"host": entry}
+            replicas.append(Struct({**environment, **entry}))
+
+        return replicas
+
+    def create_replica_engines(
+        self: "DBConnectionManager", connection: str
+    ) -> dict[str, Engine]:
+        """
+        Creates an engine for each read replica of a connection.
+
+        Returns:
+            A mapping of replica host to engine.
+        """
+        config = self.connections[connection]
+        engines = {}
+        for replica in self.replica_hosts(connection):
+            overrides = {k: replica[k] for k in ("port", "database") if k in replica}
+            replica_config = Struct({**config, **overrides, "_replica": replica})
+            connstring = self._build_connstring(replica_config, "_replica")
+            engines[str(replica.host)] = self._create_engine(config, connstring)
+
+        return engines
+
     def close_all(self: "DBConnectionManager"):
         """
         Closes all the database connections.
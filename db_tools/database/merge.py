@@ -0,0 +1,225 @@
+import functools
+from typing import Any, Iterable, Iterator, Optional
+
+from sqlalchemy.engine.base import Connection, Engine
+from sqlalchemy.engine.result import Result
+from sqlalchemy.sql._elements_constructors import text
+
+from .aggregation import SUBQUERY_ALIAS, strip_query
+
+# Sort expressions that order text by code point, as Python compares str,
+# whatever the column's collation. Without them a case-insensitive default
+# collation (MySQL, SQL Server) orders each stream differently from the merge.
+BINARY_SORT = {
+    "postgresql": '{column} COLLATE "C"',
+    "mysql": "CONVERT({column} USING utf8mb4) COLLATE utf8mb4_bin",
+    "sqlserver": "{column} COLLATE Latin1_General_BIN2",
+    "oracle": "NLSSORT({column}, 'NLS_SORT=BINARY')",
+    "sqlite": "{column} COLLATE BINARY",
+}
+
+
+@functools.total_ordering
+class _SortKey:
+    """
+    Comparable wrapper for a row's sort values with per-column direction.
+
+    NULLs sort last regardless of direction, matching the merge of streams
+    that were each ordered with NULLS LAST semantics.
+    """
+
+    __slots__ = ("values", "descending")
+
+    def __init__(self: "_SortKey", values: tuple, descending: tuple[bool, ...]):
+        self.values = values
+        self.descending = descending
+
+    def __eq__(self: "_SortKey", other: object) -> bool:
+        return isinstance(other, _SortKey) and self.values == other.values
+
+    def __lt__(self: "_SortKey", other: "_SortKey") -> bool:
+        for a, b, descending in zip(self.values, other.values, self.descending):
+            if a == b:
+                continue
+            if a is None:
+                return False
+            if b is None:
+                return True
+            return a > b if descending else a < b
+        return False
+
+
+class TopNPlan:
+    """
+    Computes a global ORDER BY ... LIMIT across connections.
+
+    Each connection runs the query ordered and limited to N, and the sorted
+    streams are k-way merged with a heap. Rows are fetched in small batches,
+    so a connection whose rows stop making the cut is never read further.
+
+    Text columns are ordered by code point (binary collation), so "B" sorts
+    before "a" whatever collation the databases use.
+    """
+
+    order_by: list[tuple[str, bool]]
+    limit: int
+
+    def __init__(self: "TopNPlan", order_by: list[str], limit: int):
+        """
+        Initializes a new TopNPlan object.
+
+        Args:
+            order_by: The ordering columns as `column` or `column:desc`.
+            limit: The number of rows to return globally.
+        """
+        if not order_by:
+            raise ValueError("At least one order by column is required!")
+        if limit < 1:
+            raise ValueError("Limit must be a positive integer!")
+
+        self.order_by = []
+        for spec in order_by:
+            column, _, direction = spec.partition(":")
+            direction = direction.strip().lower() or "asc"
+            if direction not in ["asc", "desc"]:
+                raise ValueError(f"Invalid order direction '{direction}' for {column}!")
+            self.order_by.append((column.strip(), direction == "desc"))
+        self.limit = limit
+
+    def rewrite(
+        self: "TopNPlan",
+        query: str,
+        db_type: str,
+        text_columns: Iterable[str] = (),
+    ) -> str:
+        """
+        Wraps a query so a connection returns its own top N rows in order.
+
+        Args:
+            query: The user's query.
+            db_type: The connection's driver type.
+            text_columns: The ordering columns holding text, which are
+                ordered with a binary collation.
+
+        Returns:
+            The rewritten query.
+        """
+        text_columns = set(text_columns)
+
+        def _sort_expression(column: str) -> str:
+            if column not in text_columns:
+                return column
+            return BINARY_SORT.get(db_type, "{column}").format(column=column)
+
+        # NULLs are pushed last explicitly, since each dialect has its own
+        # default and the merge needs every stream ordered the same way.
+        order = ", ".join(
+            f"CASE WHEN {column} IS NULL THEN 1 ELSE 0 END, "
+            f"{_sort_expression(column)} {'DESC' if descending else 'ASC'}"
+            for column, descending in self.order_by
+        )
+        subquery = strip_query(query)
+
+        if db_type == "sqlserver":
+            return f"SELECT TOP {self.limit} * FROM ({subquery}) {SUBQUERY_ALIAS} ORDER BY {order}"
+        if db_type == "oracle":
+            return (
+                f"SELECT * FROM ({subquery}) {SUBQUERY_ALIAS} ORDER BY {order} "
+                f"FETCH FIRST {self.limit} ROWS ONLY"
+            )
+        return f"SELECT * FROM ({subquery}) {SUBQUERY_ALIAS} ORDER BY {order} LIMIT {self.limit}"
+
+    def text_columns(
+        self: "TopNPlan", columns: list[str], rows: Iterable[tuple]
+    ) -> list[str]:
+        """
+        Returns the ordering columns that hold text in the given rows.
+        """
+        indexes = {column: columns.index(column) for column, _ in self.order_by}
+        rows = list(rows)
+
+        return [
+            column
+            for column, index in indexes.items()
+            if any(isinstance(row[index], str) for row in rows)
+        ]
+
+    def sort_key(self: "TopNPlan", columns: list[str]):
+        """
+        Returns the key function used to merge rows with the given columns.
+        """
+        indexes = [columns.index(column) for column, _ in self.order_by]
+        descending = tuple(descending for _, descending in self.order_by)
+
+        return lambda item: _SortKey(tuple(item[0][i] for i in indexes), descending)
+
+
+class SortedStream:
+    """
+    A server-side cursor over one connection's ordered rows, read in batches.
+    """
+
+    connection: str
+    batch_size: int
+    columns: list[str]
+
+    def __init__(
+        self: "SortedStream",
+        engine: Engine,
+        connection: str,
+        query: str,
+        batch_size: int = 500,
+    ):
+        """
+        Opens the stream and fetches its first batch.
+
+        Args:
+            engine: The connection's engine.
+            connection: The connection name.
+            query: The ordered and limited query.
+            batch_size: How many rows to fetch per round trip.
+        """
+        self.connection = connection
+        self.batch_size = batch_size
+        self._conn: Optional[Connection] = engine.connect()
+        try:
+            self._result: Optional[Result] = self._conn.execution_options(
+                stream_results=True
+            ).execute(text(query))
+            self.columns = list(self._result.keys())
+            self._buffer = self._result.fetchmany(self.batch_size)
+        except Exception:
+            self.close()
+            raise
+
+    @property
+    def buffered(self: "SortedStream") -> list:
+        """
+        The rows fetched but not yet read.
+        """
+        return self._buffer
+
+    def __iter__(self: "SortedStream") -> Iterator[tuple[tuple, str]]:
+        while self._buffer:
+            for row in self._buffer:
+                yield tuple(row), self.connection
+            if self._result is None:
+                return
+            self._buffer = self._result.fetchmany(self.batch_size)
+
+    def close(self: "SortedStream"):
+        """
+        Closes the cursor and returns the connection to the pool.
+        """
+        if self._result is not None:
+            self._result.close()
+            self._result = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self: "SortedStream") -> "SortedStream":
+        return self
+
+    def __exit__(self: "SortedStream", *args: Any):
+        self.close()
@@ -0,0 +1,159 @@
+import re
+from datetime import date, datetime
+from typing import Any, Optional
+
+from .aggregation import SUBQUERY_ALIAS, strip_query
+
+PARTITION_MODES = ["range", "hash"]
+
+SNAPSHOT_ID = re.compile(r"^[0-9A-Fa-f]+-[0-9A-Fa-f]+(-[0-9]+)?$")
+
+
+class PartitionPlan:
+    """
+    Splits one connection's query into concurrent subqueries over a column,
+    similar to Spark's JDBC `partitionColumn`/`numPartitions` reads.
+
+    In range mode the bounds (given, or read with MIN/MAX) are divided into
+    equal strides; the first partition also takes NULLs and values below the
+    lower bound and the last one values above the upper bound, so no row is
+    lost when the bounds are only estimates. In hash mode each partition
+    takes the rows whose integer column modulo N matches its index.
+    """
+
+    column: str
+    partitions: int
+    mode: str
+    lower: Optional[Any]
+    upper: Optional[Any]
+    snapshot: bool
+
+    def __init__(
+        self: "PartitionPlan",
+        column: str,
+        partitions: int,
+        mode: str = "range",
+        lower: Optional[Any] = None,
+        upper: Optional[Any] = None,
+        snapshot: bool = True,
+    ):
+        """
+        Initializes a new PartitionPlan object.
+
+        Args:
+            column: The partition column. Numeric or date/time for range mode,
+                integer for hash mode.
+            partitions: The number of subqueries per connection.
+            mode: The partitioning mode: range or hash.
+            lower: The lower bound for range mode, or None to read it.
+            upper: The upper bound for range mode, or None to read it.
+            snapshot: Whether PostgreSQL partitions share one exported
+                snapshot, so they see a single consistent state.
+        """
+        if partitions < 1:
+            raise ValueError("The number of partitions must be a positive integer!")
+        if mode not in PARTITION_MODES:
+            raise ValueError(
+                f"Unknown partition mode '{mode}'! "
+                f"Available: {', '.join(PARTITION_MODES)}"
+            )
+
+        self.column = column
+        self.partitions = partitions
+        self.mode = mode
+        self.lower = lower
+        self.upper = upper
+        self.snapshot = snapshot
+
+    @property
+    def needs_bounds(self: "PartitionPlan") -> bool:
+        return self.mode == "range" and (self.lower is None or self.upper is None)
+
+    def bounds_query(self: "PartitionPlan", query: str) -> str:
+        """
+        Returns a query reading the MIN and MAX of the partition column.
+        """
+        return (
+            f"SELECT MIN({self.column}), MAX({self.column}) "
+            f"FROM ({strip_query(query)}) {SUBQUERY_ALIAS}"
+        )
+
+    def _boundaries(self: "PartitionPlan", lower: Any, upper: Any) -> list[Any]:
+        """
+        Returns the N - 1 inner boundaries between `lower` and `upper`, without
+        duplicates (a narrow integer range yields fewer partitions).
+        """
+        span = upper - lower
+        boundaries = []
+        for i in range(1, self.partitions):
+            if isinstance(lower, int) and isinstance(upper, int):
+                boundary = lower + span * i // self.partitions
+            else:
+                boundary = lower + span * i / self.partitions
+            if isinstance(lower, date) and not isinstance(lower, datetime):
+                boundary = date.fromordinal(boundary.toordinal())
+            if lower < boundary < upper and boundary not in boundaries:
+                boundaries.append(boundary)
+
+        return boundaries
+
+    def queries(
+        self: "PartitionPlan",
+        query: str,
+        lower: Optional[Any] = None,
+        upper: Optional[Any] = None,
+        db_type: Optional[str] = None,
+    ) -> list[tuple[str, dict[str, Any]]]:
+        """
+        Rewrites a query into its partition subqueries.
+
+        Args:
+            query: The query to partition.
+            lower: The lower bound, overriding the plan's.
+            upper: The upper bound, overriding the plan's.
+            db_type: The connection's database type, for dialect-specific SQL.
+
+        Returns:
+            A list of (query, bound parameters) tuples, in partition order.
+        """
+        source = f"SELECT * FROM ({strip_query(query)}) {SUBQUERY_ALIAS}"
+        column = self.column
+
+        if self.mode == "hash":
+            # Oracle has no % operator.
+            if db_type == "oracle":
+                bucket = f"MOD(ABS({column}), {self.partitions})"
+            else:
+                bucket = f"ABS({column}) % {self.partitions}"
+            return [
+                (f"{source} WHERE {bucket} = {i}", {}) for i in range(self.partitions)
+            ] + [(f"{source} WHERE {column} IS NULL", {})]
+
+        lower = self.lower if lower is None else lower
+        upper = self.upper if upper is None else upper
+        if lower is None or upper is None or not lower < upper:
+            return [(source, {})]
+
+        boundaries = self._boundaries(lower, upper)
+        if not boundaries:
+            return [(source, {})]
+
+        queries = [
+            (
+                f"{source} WHERE {column} < :p0 OR {column} IS NULL",
+                {"p0": boundaries[0]},
+            )
+        ]
+        for i in range(1, len(boundaries)):
+            queries.append(
+                (
+                    f"{source} WHERE {column} >= :p{i - 1} AND {column} < :p{i}",
+                    {f"p{i - 1}": boundaries[i - 1], f"p{i}": boundaries[i]},
+                )
+            )
+        last = len(boundaries) - 1
+        queries.append(
+            (f"{source} WHERE {column} >= :p{last}", {f"p{last}": boundaries[last]})
+        )
+
+        return queries
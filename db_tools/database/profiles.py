@@ -0,0 +1,173 @@
+import re
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine.base import Engine
+
+# Defaults applied before the global and per-connection profiles. Oracle
+# fetches are round-trip bound with the driver's default of 100 rows, and
+# pyodbc inserts row by row unless fast_executemany is on.
+DEFAULT_PROFILES: dict[str, dict[str, Any]] = {
+    "oracle": {"arraysize": 5000, "prefetchrows": 5001},
+    "sqlserver": {"fast_executemany": True},
+    "postgresql": {"prepare_threshold": 5},
+}
+
+POOL_OPTIONS = [
+    "pool_size",
+    "max_overflow",
+    "pool_timeout",
+    "pool_recycle",
+    "pool_pre_ping",
+    "isolation_level",
+]
+
+IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_.]*$")
+
+
+def resolve_profile(
+    db_type: str, global_profiles: dict[str, Any], connection_profile: dict[str, Any]
+) -> dict[str, Any]:
+    """
+    Merges the performance profile of a connection.
+
+    Later levels override earlier ones: the built-in defaults of the driver,
+    the driver's `[profiles.<type>]` table in config.toml and the
+    connection's own `profile` table. `session` tables are merged key by key.
+
+    Args:
+        db_type: The connection's driver type.
+        global_profiles: The `[profiles]` table of config.toml.
+        connection_profile: The connection's `profile` table.
+
+    Returns:
+        The merged profile.
+    """
+    profile: dict[str, Any] = {}
+    for level in (
+        DEFAULT_PROFILES.get(db_type, {}),
+        global_profiles.get(db_type, {}),
+        connection_profile,
+    ):
+        for key, value in level.items():
+            if key == "session":
+                profile["session"] = {**profile.get("session", {}), **value}
+            else:
+                profile[key] = value
+
+    return profile
+
+
+def engine_options(db_type: str, profile: dict[str, Any]) -> dict[str, Any]:
+    """
+    Translates a profile into `create_engine` keyword arguments.
+    """
+    options: dict[str, Any] = {
+        key: profile[key] for key in POOL_OPTIONS if key in profile
+    }
+    connect_args: dict[str, Any] = {}
+    execution_options: dict[str, Any] = {}
+
+    if profile.get("stream_results"):
+        execution_options["stream_results"] = True
+    if "itersize" in profile:
+        execution_options["max_row_buffer"] = profile["itersize"]
+
+    if db_type == "postgresql":
+        if "prepare_threshold" in profile:
+            connect_args["prepare_threshold"] = profile["prepare_threshold"]
+        # Session settings travel in the startup packet, without a round trip.
+        session = profile.get("session", {})
+        if session:
+            connect_args["options"] = " ".join(
+                f"-c {_identifier(key)}={_option_value(value)}"
+                for key, value in session.items()
+            )
+    elif db_type == "sqlserver":
+        if "fast_executemany" in profile:
+            options["fast_executemany"] = profile["fast_executemany"]
+    elif db_type == "oracle":
+        if "arraysize" in profile:
+            options["arraysize"] = profile["arraysize"]
+
+    if connect_args:
+        options["connect_args"] = connect_args
+    if execution_options:
+        options["execution_options"] = execution_options
+
+    return options
+
+
+def _identifier(name: str) -> str:
+    if not IDENTIFIER.match(name):
+        raise ValueError(f"Invalid session option '{name}'!")
+    return name
+
+
+def _option_value(value: Any) -> str:
+    # libpq splits the options string on unescaped spaces.
+    return str(value).replace(" ", "\\ ")
+
+
+def _literal(value: Any) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def session_statements(db_type: str, profile: dict[str, Any]) -> list[str]:
+    """
+    Returns the statements that apply a profile's session options on a new
+    connection. PostgreSQL is handled by `engine_options` instead.
+    """
+    session = profile.get("session", {})
+    templates = {
+        "mysql": "SET SESSION {key} = {value}",
+        "sqlserver": "SET {key} {raw}",
+        "oracle": "ALTER SESSION SET {key} = {value}",
+        "sqlite": "PRAGMA {key} = {raw}",
+    }
+    if db_type not in templates:
+        return []
+
+    return [
+        templates[db_type].format(
+            key=_identifier(key), value=_literal(value), raw=value
+        )
+        for key, value in session.items()
+    ]
+
+
+def install_profile(engine: Engine, db_type: str, profile: dict[str, Any]):
+    """
+    Registers the connection and cursor hooks a profile needs on an engine.
+
+    Args:
+        engine: The connection's engine.
+        db_type: The connection's driver type.
+        profile: The merged profile.
+    """
+    statements = session_statements(db_type, profile)
+    if statements:
+
+        @event.listens_for(engine, "connect")
+        def _apply_session(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for statement in statements:
+                    cursor.execute(statement)
+            finally:
+                cursor.close()
+
+    cursor_options = {
+        key: profile[key] for key in ("arraysize", "prefetchrows") if key in profile
+    }
+    if cursor_options:
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _tune_cursor(conn, cursor, statement, parameters, context, executemany):
+            for key, value in cursor_options.items():
+                if hasattr(cursor, key):
+                    setattr(cursor, key, value)
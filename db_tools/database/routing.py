@@ -0,0 +1,254 @@
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from concurrent.futures.thread import ThreadPoolExecutor
+from typing import Any, Optional
+
+import pandas as pd
+from sqlalchemy.engine.base import Engine
+from sqlalchemy.sql._elements_constructors import text
+
+from ..logger import get_logger
+from ..profiling import stage
+from .health import ConnectionHealthStore, is_connectivity_error
+from .scheduler import RuntimeHistory
+
+PRIMARY = "primary"
+
+
+class ReplicaRouter:
+    """
+    Routes a connection's reads across its primary and read replicas.
+
+    Each read goes to a target drawn with probability inversely
+    proportional to its observed latency (targets without history are
+    preferred, so they get measured). When a query is expected to be short
+    on the chosen target but runs well past its usual runtime there, a hedged
+    request is sent to another target; the first to finish wins and the other
+    is cancelled. Queries without a runtime history on the target, or
+    expected to be long, are never hedged.
+    """
+
+    connection: str
+    targets: dict[str, Engine]
+    health: ConnectionHealthStore
+    runtimes: Optional[RuntimeHistory]
+    hedge: bool
+    hedge_factor: float
+    hedge_max: float
+
+    def __init__(
+        self: "ReplicaRouter",
+        connection: str,
+        targets: dict[str, Engine],
+        health: ConnectionHealthStore,
+        runtimes: Optional[RuntimeHistory] = None,
+        hedge: bool = True,
+        hedge_factor: float = 2.0,
+        hedge_max: float = 10.0,
+    ):
+        """
+        Initializes a new ReplicaRouter object.
+
+        Args:
+            connection: The connection name.
+            targets: The engines reads may go to, by target name.
+            health: The store latencies and failures are recorded in.
+            runtimes: The history each query's runtime per target is recorded
+                in, keyed by query fingerprint. Without it reads are never
+                hedged.
+            hedge: Whether slow reads are hedged on a second target.
+            hedge_factor: How many times its expected runtime a read may take
+                before it is hedged.
+            hedge_max: The longest expected runtime, in seconds, of a query
+                that is still hedged.
+        """
+        self.logger = get_logger(__name__)
+        self.connection = connection
+        self.targets = targets
+        self.health = health
+        self.runtimes = runtimes
+        self.hedge = hedge
+        self.hedge_factor = hedge_factor
+        self.hedge_max = hedge_max
+
+    def _key(self: "ReplicaRouter", target: str) -> str:
+        return f"{self.connection}@{target}"
+
+    def _order(self: "ReplicaRouter") -> list[str]:
+        """
+        Returns the available targets, the first drawn by inverse latency and
+        the rest fastest first.
+        """
+        available = [t for t in self.targets if not self.health.is_open(self._key(t))]
+        if not available:
+            available = list(self.targets)
+
+        latencies = {t: self.health.expected_latency(self._key(t)) for t in available}
+        known = [latency for latency in latencies.values() if latency is not None]
+        fastest = min(known) if known else 1.0
+        weights = [
+            1 / max(latencies[t] if latencies[t] is not None else fastest, 1e-3)
+            for t in available
+        ]
+
+        first = random.choices(available, weights=weights)[0]
+        rest = sorted(
+            (t for t in available if t != first),
+            key=lambda t: latencies[t] if latencies[t] is not None else 0,
+        )
+        return [first] + rest
+
+    def _read(
+        self: "ReplicaRouter",
+        target: str,
+        query: str,
+        params: Optional[dict[str, Any]],
+        raw_connections: dict[str, Any],
+        fingerprint: Optional[str],
+    ) -> pd.DataFrame:
+        start = time.perf_counter()
+        with stage("connect"):
+            conn = self.targets[target].connect()
+        with conn:
+            raw_connections[target] = conn.connection.dbapi_connection
+            with stage("read_sql"):
+                df = pd.read_sql(text(query), conn, params=params)
+
+        elapsed = time.perf_counter() - start
+        self.health.record_success(self._key(target), elapsed)
+        if self.runtimes is not None and fingerprint is not None:
+            self.runtimes.record(fingerprint, self._key(target), elapsed)
+        return df
+
+    def _hedge_delay(
+        self: "ReplicaRouter", target: str, fingerprint: Optional[str]
+    ) -> Optional[float]:
+        """
+        Returns the seconds after which a read of a query on a target is
+        hedged, or None when it should not be.
+        """
+        if not self.hedge or self.runtimes is None or fingerprint is None:
+            return None
+
+        expected = self.runtimes.expected(
+            fingerprint, self._key(target), fallback=False
+        )
+        if expected is None or expected > self.hedge_max:
+            return None
+
+        return expected * self.hedge_factor
+
+    def _cancel(self: "ReplicaRouter", target: str, raw_connections: dict[str, Any]):
+        cancel = getattr(raw_connections.get(target), "cancel", None)
+        if cancel is None:
+            return
+        try:
+            cancel()
+            self.logger.info(f"Cancelled hedged read on {self._key(target)}")
+        except Exception as e:
+            self.logger.warning(f"Could not cancel read on {self._key(target)}: {e}")
+
+    def read(
+        self: "ReplicaRouter",
+        query: str,
+        params: Optional[dict[str, Any]] = None,
+        fingerprint: Optional[str] = None,
+    ) -> tuple[pd.DataFrame, str]:
+        """
+        Runs a read on the best target, hedging it when it is slow.
+
+        Args:
+            query: The DQL query.
+            params: Bound parameters of the query, if any.
+            fingerprint: The query fingerprint its runtimes are kept under.
+
+        Returns:
+            The result and the name of the target that produced it.
+        """
+        order = self._order()
+        first = order[0]
+        raw_connections: dict[str, Any] = {}
+        executor = ThreadPoolExecutor(max_workers=2)
+        futures: dict[Future, str] = {
+            executor.submit(
+                self._read, first, query, params, raw_connections, fingerprint
+            ): first
+        }
+
+        try:
+            delay = self._hedge_delay(first, fingerprint)
+            done = set()
+            if delay is not None:
+                done, _ = wait(futures, timeout=delay)
+
+            if delay is not None and not done and len(order) > 1:
+                second = order[1]
+                self.logger.info(
+                    f"Read on {self._key(first)} exceeded {delay:.2f}s, "
+                    f"hedging on {second}"
+                )
+                futures[
+                    executor.submit(
+                        self._read, second, query, params, raw_connections, fingerprint
+                    )
+                ] = second
+
+            pending = set(futures)
+            error: Optional[Exception] = None
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    target = futures[future]
+                    try:
+                        df = future.result()
+                    except Exception as e:
+                        if is_connectivity_error(e):
+                            self.health.record_failure(self._key(target), e)
+                        error = e
+                        continue
+
+                    for other in pending:
+                        other.cancel()
+                        self._cancel(futures[other], raw_connections)
+                    return df, target
+
+            raise error
+        finally:
+            executor.shutdown(wait=False)
+
+
+class RoutingTable:
+    """
+    Holds the replica routers of a runner's connections.
+    """
+
+    routers: dict[str, ReplicaRouter]
+
+    def __init__(self: "RoutingTable"):
+        """
+        Initializes a new RoutingTable object.
+        """
+        self.routers = {}
+        self._lock = threading.Lock()
+
+    def get(self: "RoutingTable", connection: str) -> Optional[ReplicaRouter]:
+        with self._lock:
+            return self.routers.get(connection)
+
+    def add(self: "RoutingTable", router: ReplicaRouter):
+        with self._lock:
+            self.routers[router.connection] = router
+
+    def dispose(self: "RoutingTable"):
+        """
+        Disposes of every replica engine. Primary engines are left to the
+        manager.
+        """
+        with self._lock:
+            for router in self.routers.values():
+                for target, engine in router.targets.items():
+                    if target != PRIMARY:
+                        engine.dispose()
+            self.routers.clear()
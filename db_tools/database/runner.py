@@ -1,19 +1,48 @@
 import hashlib
-import pickle
+import heapq
+import itertools
+import queue
+import random
 import re
+import time
+from collections import Counter
 from concurrent.futures._base import as_completed
+from concurrent.futures.process import ProcessPoolExecutor
 from concurrent.futures.thread import ThreadPoolExecutor
+from contextlib import ExitStack
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Callable, Optional, Union
 
+import numpy as np
 import pandas as pd
 from psycopg.errors import OperationalError
 from sqlalchemy.sql._elements_constructors import text
 
 from db_tools.database.query_type import QueryType
 
+from ..extras import Struct
 from ..logger import get_logger
+from ..profiling import stage
+from .aggregation import SUBQUERY_ALIAS, AggregationPlan, strip_query
+from .cache import ResultCache
+from .dtypes import SchemaUnifier
+from .health import CircuitOpenError, ConnectionHealthStore, is_connectivity_error
 from .manager import DBConnectionManager
+from .merge import SortedStream, TopNPlan
+from .partition import SNAPSHOT_ID, PartitionPlan
+from .routing import PRIMARY, ReplicaRouter, RoutingTable
+from .scheduler import ConnectionScheduler, RuntimeHistory, query_fingerprint
+from .schema import (
+    SchemaCache,
+    SchemaMismatchError,
+    compare_schemas,
+    fetch_result_schema,
+    fetch_schema,
+)
+from .shard_index import ShardIndex
+from .spill import SpillBuffer, SpilledResult
+from .watermark import WatermarkStore
+from .worker import fetch_to_shared_memory, read_from_shared_memory
 
 
 class DBConnectionRunner(DBConnectionManager):
@@ -23,6 +52,13 @@ class DBConnectionRunner(DBConnectionManager):
 
     save_path: Optional[Path]
     kwargs: dict
+    health: ConnectionHealthStore
+    runtimes: RuntimeHistory
+    watermarks: WatermarkStore
+    cache: ResultCache
+    routing: RoutingTable
+    shard_index: ShardIndex
+    failed_extractions: dict[str, Any]
 
     def __init__(
         self: "DBConnectionRunner",
@@ -48,18 +84,74 @@ class DBConnectionRunner(DBConnectionManager):
         self.save_path = save_path
         self.kwargs = kwargs
 
+        health_config = self.configurations.get("health", Struct())
+        self.health = ConnectionHealthStore(
+            Path(".cache/health.json"),
+            environment,
+            failure_threshold=health_config.get("failure_threshold", 3),
+            cooldown=health_config.get("cooldown", 300),
+        )
+        self.runtimes = RuntimeHistory(Path(".cache/runtimes.json"))
+        self.watermarks = WatermarkStore(Path(".cache/watermarks.json"))
+        self.cache = ResultCache(
+            Path(self.configurations.get("cache_path", ".cache")).expanduser(),
+            self.configurations.get("cache_format", "parquet"),
+            self.configurations.get("cache_compression", "none"),
+            self.configurations.get("cache_queue_size", 2),
+            self.configurations.get("cache_verify", False),
+            self.configurations.get("cache_shared", False),
+            self.configurations.get("cache_lease_timeout", 3600),
+            self.configurations.get("cache_sweep_grace", 600),
+        )
+        self.routing = RoutingTable()
+        self.shard_index = ShardIndex(Path(".cache/shard_index.json"), environment)
+        self.failed_extractions = {}
+
     def _cache_query_result(
         self: "DBConnectionRunner",
         query: str,
-        df: pd.DataFrame,
+        df: Union[pd.DataFrame, SpilledResult],
         failed_extractions: dict,
         run_hash: str,
+        on_commit: Optional[Callable[[], None]] = None,
     ):
-        cache_root = f".cache/{run_hash}"
+        self.cache.submit(run_hash, df, failed_extractions, on_commit)
 
-        df.to_parquet(f"{cache_root}.parquet")
-        with open(f"{cache_root}.pkl", "wb") as f:
-            pickle.dump(failed_extractions, f)
+    def _run_hash(self: "DBConnectionRunner", query: str) -> str:
+        """
+        Returns the cache key of a query run on the current environment and
+        connections.
+        """
+        return hashlib.sha256(
+            f"{query}{','.join(self.connections)}{self.environment}".encode()
+        ).hexdigest()
+
+    def load_cached_result(
+        self: "DBConnectionRunner",
+        query: str,
+        columns: Optional[list[str]] = None,
+        rows: Optional[int] = None,
+    ) -> Optional[pd.DataFrame]:
+        """
+        Loads the cached result of a query, if there is one.
+
+        Args:
+            query: The query whose result to load.
+            columns: The columns to load, or None for all.
+            rows: The maximum number of rows per connection, or None for all.
+
+        Returns:
+            The cached DataFrame, or None on a cache miss.
+        """
+        with stage("cache_read"):
+            cached = self.cache.read(
+                self._run_hash(query), columns, rows, self.configurations.column_name
+            )
+        if cached is None:
+            return None
+
+        df, self.failed_extractions = cached
+        return df
 
     def verify_query_type(self: "DBConnectionRunner", query: str) -> QueryType:
         # Strip query of comments
@@ -100,6 +192,7 @@ class DBConnectionRunner(DBConnectionManager):
         connection: str,
         query_type: QueryType,
         commit: bool = False,
+        params: Optional[dict[str, Any]] = None,
     ) -> dict[str, Any]:
         """
         Executes a query on a single database connection.
@@ -108,6 +201,7 @@ class DBConnectionRunner(DBConnectionManager):
             query: The query to execute.
             connection: The name of the connection to execute the query on.
             commit: Whether to commit the transaction.
+            params: Bound parameters of the query, if any.
 
         Returns:
             A dictionary containing the results of the query.
@@ -118,17 +212,22 @@ class DBConnectionRunner(DBConnectionManager):
                 self.logger.info(f"--> Attempting query on connection: {connection}")
                 df = None
                 retries += 1
-                with self.engines[connection].connect() as conn:
+                start = time.perf_counter()
+                with stage("connect"):
+                    conn = self.engines[connection].connect()
+                with conn:
                     if query_type == QueryType.DQL:
-                        df = pd.read_sql(text(query), conn)
+                        with stage("read_sql"):
+                            df = pd.read_sql(text(query), conn, params=params)
                     elif query_type in [QueryType.DML, QueryType.DDL]:
-                        conn.execute(text(query))
+                        conn.execute(text(query), params)
 
                         if commit:
                             conn.commit()
                         else:
                             conn.rollback()
 
+                self.health.record_success(connection, time.perf_counter() - start)
                 return {"success": True, "data": df}
             except OperationalError as e:
                 """ Attempting to handle transient connection issues. """
@@ -140,98 +239,1327 @@ class DBConnectionRunner(DBConnectionManager):
                         f"Connection attempt on {connection} failed. Attempt: {retries}. Timeout: {new_timeout}."
                     )
                     self.engines[connection].execution_options(timeout=new_timeout)
-                    return self.execute_query(
-                        query,
-                        connection,
-                        query_type,
-                        commit,
-                    )
+                    continue
                 else:
+                    self.health.record_failure(connection, e)
                     return {"success": False, "error": e}
             except Exception as e:
                 self.logger.error(
                     f"xxx FAILED query on connection: {connection} | Error: {e}"
                 )
+                # Statement errors (a missing table, bad syntax) say nothing
+                # about the connection, so they leave its breaker alone.
+                if is_connectivity_error(e):
+                    self.health.record_failure(connection, e)
                 return {"success": False, "error": e}
 
+    def execute_query_in_process(
+        self: "DBConnectionRunner",
+        process_pool: ProcessPoolExecutor,
+        query: str,
+        connection: str,
+        params: Optional[dict[str, Any]] = None,
+    ) -> dict[str, Any]:
+        """
+        Executes a DQL query on a single connection inside a worker process.
+
+        The worker opens its own engine and returns the result through shared
+        memory as an Arrow IPC stream.
+
+        Args:
+            process_pool: The pool to run the worker in.
+            query: The query to execute.
+            connection: The name of the connection to execute the query on.
+            params: Bound parameters of the query, if any.
+
+        Returns:
+            A dictionary containing the results of the query.
+        """
+        self.logger.info(f"--> Attempting query on connection: {connection}")
+        start = time.perf_counter()
+        try:
+            with stage("process_fetch"):
+                result = process_pool.submit(
+                    fetch_to_shared_memory,
+                    self.connections[connection].connstring,
+                    query,
+                    params,
+                    self.connections[connection].type,
+                    self.connections[connection].performance,
+                ).result()
+            if not result["success"]:
+                # Only the message crosses the process boundary, so the
+                # worker classifies the error itself.
+                if result.get("connectivity"):
+                    raise ConnectionError(result["error"])
+                raise RuntimeError(result["error"])
+
+            with stage("arrow_decode"):
+                df = read_from_shared_memory(result["shm"], result["size"])
+        except Exception as e:
+            self.logger.error(
+                f"xxx FAILED query on connection: {connection} | Error: {e}"
+            )
+            if is_connectivity_error(e):
+                self.health.record_failure(connection, e)
+            return {"success": False, "error": e}
+
+        self.health.record_success(connection, time.perf_counter() - start)
+        return {"success": True, "data": df}
+
+    def execute_query_partitioned(
+        self: "DBConnectionRunner",
+        query: str,
+        connection: str,
+        plan: PartitionPlan,
+        params: Optional[dict[str, Any]] = None,
+        sessions: Optional[int] = None,
+    ) -> dict[str, Any]:
+        """
+        Executes a DQL query on a single connection as concurrent partition
+        subqueries, spread over at most `sessions` pooled connections.
+
+        On PostgreSQL, when the plan asks for it, the first connection exports
+        its snapshot and the others import it, so every partition reads the
+        same consistent state. Partitions are concatenated in order.
+
+        Args:
+            query: The query to execute.
+            connection: The name of the connection to execute the query on.
+            plan: The partition plan.
+            params: Bound parameters of the query, if any.
+            sessions: The most database sessions to open, including the
+                leader. Defaults to `_partition_sessions`.
+
+        Returns:
+            A dictionary containing the results of the query.
+        """
+        self.logger.info(
+            f"--> Attempting query on connection: {connection} "
+            f"({plan.partitions} {plan.mode} partitions)"
+        )
+        engine = self.engines[connection]
+        snapshot = plan.snapshot and self.connections[connection].type == "postgresql"
+        start = time.perf_counter()
+
+        try:
+            with ExitStack() as stack:
+                leader = stack.enter_context(engine.connect())
+                snapshot_id = None
+                if snapshot:
+                    leader = leader.execution_options(isolation_level="REPEATABLE READ")
+                    snapshot_id = leader.execute(
+                        text("SELECT pg_export_snapshot()")
+                    ).scalar()
+                    if not SNAPSHOT_ID.match(str(snapshot_id)):
+                        raise ValueError(f"Unexpected snapshot id '{snapshot_id}'!")
+
+                lower, upper = plan.lower, plan.upper
+                if plan.needs_bounds:
+                    row = leader.execute(
+                        text(plan.bounds_query(query)), params or {}
+                    ).one()
+                    lower = row[0] if lower is None else lower
+                    upper = row[1] if upper is None else upper
+
+                subqueries = plan.queries(
+                    query, lower, upper, self.connections[connection].type
+                )
+
+                # Each worker thread holds one session for all the partitions
+                # it reads, the leader included, so the connection never has
+                # more than `sessions` open against its host.
+                if sessions is None:
+                    sessions = self._partition_sessions(connection, plan)
+                workers = max(1, min(len(subqueries), sessions))
+                pool: queue.Queue = queue.Queue()
+                pool.put(leader)
+                for _ in range(workers - 1):
+                    conn = stack.enter_context(engine.connect())
+                    if snapshot_id is not None:
+                        conn = conn.execution_options(isolation_level="REPEATABLE READ")
+                        conn.execute(text(f"SET TRANSACTION SNAPSHOT '{snapshot_id}'"))
+                    pool.put(conn)
+
+                def _fetch(index: int) -> pd.DataFrame:
+                    subquery, subparams = subqueries[index]
+                    subparams = {**(params or {}), **subparams}
+                    conn = pool.get()
+                    try:
+                        with stage("read_sql"):
+                            return pd.read_sql(text(subquery), conn, params=subparams)
+                    finally:
+                        pool.put(conn)
+
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    frames = list(executor.map(_fetch, range(len(subqueries))))
+                leader.rollback()
+        except Exception as e:
+            self.logger.error(
+                f"xxx FAILED query on connection: {connection} | Error: {e}"
+            )
+            if is_connectivity_error(e):
+                self.health.record_failure(connection, e)
+            return {"success": False, "error": e}
+
+        self.health.record_success(connection, time.perf_counter() - start)
+        frames = [frame for frame in frames if not frame.empty] or frames[:1]
+        return {"success": True, "data": pd.concat(frames, ignore_index=True)}
+
+    def _partition_sessions(
+        self: "DBConnectionRunner", connection: str, plan: PartitionPlan
+    ) -> int:
+        """
+        Returns how many sessions a partitioned read of a connection may
+        open: one per partition, capped by `max_workers` and by the
+        connection's host, driver and environment limits.
+        """
+        sessions = min(plan.partitions, self.configurations.max_workers)
+        limits = self._concurrency_limits()
+        for key in self._limit_keys()[connection]:
+            if key in limits:
+                sessions = min(sessions, limits[key])
+
+        return max(1, sessions)
+
+    def _router(self: "DBConnectionRunner", connection: str) -> Optional[ReplicaRouter]:
+        """
+        Returns the replica router of a connection, creating its replica
+        engines on first use. None when routing is disabled or the connection
+        has no replicas in the current environment.
+        """
+        routing_config = self.configurations.get("routing", Struct())
+        if not routing_config.get("enabled", False):
+            return None
+
+        router = self.routing.get(connection)
+        if router is None:
+            targets = self.create_replica_engines(connection)
+            if not targets:
+                return None
+            if routing_config.get("include_primary", True):
+                targets = {PRIMARY: self.engines[connection], **targets}
+
+            router = ReplicaRouter(
+                connection,
+                targets,
+                self.health,
+                self.runtimes,
+                hedge=routing_config.get("hedge", True),
+                hedge_factor=routing_config.get("hedge_factor", 2.0),
+                hedge_max=routing_config.get("hedge_max", 10.0),
+            )
+            self.routing.add(router)
+
+        return router
+
+    def execute_query_routed(
+        self: "DBConnectionRunner",
+        query: str,
+        connection: str,
+        params: Optional[dict[str, Any]] = None,
+        fingerprint: Optional[str] = None,
+    ) -> dict[str, Any]:
+        """
+        Executes a DQL query on one of a connection's read targets, chosen by
+        the connection's replica router.
+
+        Args:
+            query: The query to execute.
+            connection: The name of the connection to execute the query on.
+            params: Bound parameters of the query, if any.
+            fingerprint: The query fingerprint, which keys the per-target
+                runtimes hedging relies on.
+
+        Returns:
+            A dictionary containing the results of the query.
+        """
+        router = self._router(connection)
+        self.logger.info(f"--> Attempting routed query on connection: {connection}")
+        start = time.perf_counter()
+        try:
+            df, target = router.read(query, params, fingerprint)
+        except Exception as e:
+            self.logger.error(
+                f"xxx FAILED query on connection: {connection} | Error: {e}"
+            )
+            if is_connectivity_error(e):
+                self.health.record_failure(connection, e)
+            return {"success": False, "error": e}
+
+        self.logger.info(f"<-- Read {len(df)} rows from {connection}@{target}")
+        self.health.record_success(connection, time.perf_counter() - start)
+        return {"success": True, "data": df}
+
+    def _timed_execute_query(
+        self: "DBConnectionRunner",
+        query: str,
+        connection: str,
+        query_type: QueryType,
+        commit: bool,
+        fingerprint: str,
+        process_pool: Optional[ProcessPoolExecutor] = None,
+        params: Optional[dict[str, Any]] = None,
+        partition: Optional[PartitionPlan] = None,
+    ) -> dict[str, Any]:
+        """
+        Runs the query on a connection, as partitions when a plan is given or
+        in a worker process when a pool is given, and records its runtime for
+        future scheduling.
+        """
+        start = time.perf_counter()
+        if partition is not None and query_type == QueryType.DQL:
+            result = self.execute_query_partitioned(
+                query, connection, partition, params
+            )
+        elif process_pool is not None:
+            result = self.execute_query_in_process(
+                process_pool, query, connection, params
+            )
+        elif query_type == QueryType.DQL and self._router(connection) is not None:
+            result = self.execute_query_routed(query, connection, params, fingerprint)
+        else:
+            result = self.execute_query(query, connection, query_type, commit, params)
+        if result["success"]:
+            self.runtimes.record(fingerprint, connection, time.perf_counter() - start)
+
+        return result
+
+    def _host_of(self: "DBConnectionRunner", connection: str) -> str:
+        """
+        Returns the physical host a connection points at in the current
+        environment, falling back to the database for file-based drivers.
+        """
+        config = self.connections[connection]
+        environment = config.get(self.environment) or Struct()
+
+        return str(environment.get("host") or config.get("database") or connection)
+
+    def _limit_keys(self: "DBConnectionRunner") -> dict[str, list[str]]:
+        """
+        Returns the concurrency limit keys each connection counts against:
+        its physical host, its driver type and the run's environment.
+        """
+        return {
+            connection: [
+                f"host:{self._host_of(connection)}",
+                f"driver:{config.type}",
+                f"environment:{self.environment}",
+            ]
+            for connection, config in self.connections.items()
+        }
+
+    def _concurrency_limits(self: "DBConnectionRunner") -> dict[str, int]:
+        """
+        Resolves the `limits` configuration into per-key concurrency limits.
+
+        `limits.per_host` applies to every host unless `limits.host` names it
+        explicitly; `limits.driver` and `limits.environment` only apply to the
+        driver types and environments they list.
+        """
+        limits_config = self.configurations.get("limits", Struct())
+        per_host = limits_config.get("per_host")
+        host_limits = limits_config.get("host", Struct())
+        limit_sources = {
+            "driver": limits_config.get("driver", Struct()),
+            "environment": limits_config.get("environment", Struct()),
+        }
+
+        limits = {}
+        for keys in self._limit_keys().values():
+            for key in keys:
+                kind, name = key.split(":", 1)
+                if kind == "host":
+                    limit = host_limits.get(name, per_host)
+                else:
+                    limit = limit_sources[kind].get(name)
+
+                if limit:
+                    limits[key] = limit
+
+        return limits
+
+    def _scheduler(self: "DBConnectionRunner") -> ConnectionScheduler:
+        """
+        Builds the fan-out scheduler from the `limits` configuration.
+        """
+        return ConnectionScheduler(
+            self.configurations.max_workers, self._concurrency_limits()
+        )
+
+    def _plan_connections(
+        self: "DBConnectionRunner",
+        failed_extractions: dict[Any, Any],
+        fingerprint: Optional[str] = None,
+        connections: Optional[list[str]] = None,
+    ) -> list[str]:
+        """
+        Orders the connections for a run.
+
+        Healthy connections are ordered longest expected runtime first when
+        `scheduler.longest_first` is enabled. Connections with an open breaker
+        are skipped (and reported in `failed_extractions`) or, when
+        `health.skip_open` is false, moved to the end of the run so they
+        don't hold up healthy connections.
+
+        Args:
+            failed_extractions: The run's failures, updated in place.
+            fingerprint: The query fingerprint used to look up runtimes.
+            connections: The connections to plan, or None for all.
+
+        Returns:
+            The connection names to run, in submission order.
+        """
+        skip_open = self.configurations.get("health", Struct()).get("skip_open", True)
+        healthy = []
+        tripped = []
+        for connection in self.connections if connections is None else connections:
+            if self.health.is_open(connection):
+                tripped.append(connection)
+            else:
+                healthy.append(connection)
+
+        longest_first = self.configurations.get("scheduler", Struct()).get(
+            "longest_first", True
+        )
+        if longest_first and fingerprint is not None:
+            healthy = self.runtimes.longest_first(fingerprint, healthy)
+
+        if not skip_open:
+            return healthy + tripped
+
+        for connection in tripped:
+            self.logger.warning(f"Skipping connection with open breaker: {connection}")
+            failed_extractions[connection] = CircuitOpenError(
+                f"Circuit breaker open for connection {connection}"
+            )
+
+        return healthy
+
+    def _discovery_query(
+        self: "DBConnectionRunner", name: str, connection: str
+    ) -> Optional[str]:
+        """
+        Returns a connection's discovery query for a shard index: its own
+        `shard_index.<name>` entry, or the index's `query`.
+        """
+        index_config = self.configurations.get("shard_index", Struct()).get(name)
+        if index_config is None:
+            raise ValueError(f"Unknown shard index '{name}'!")
+
+        overrides = self.connections[connection].get("shard_index", Struct())
+        return overrides.get(name, index_config.get("query"))
+
+    def refresh_shard_index(
+        self: "DBConnectionRunner", name: str, force: bool = False
+    ) -> list[str]:
+        """
+        Runs a shard index's discovery query on the connections whose keys
+        are missing or expired, in parallel.
+
+        Args:
+            name: The index name, a table under `[shard_index]`.
+            force: Whether to rediscover every connection, expired or not.
+
+        Returns:
+            The connections whose keys were read.
+        """
+        index_config = self.configurations.get("shard_index", Struct()).get(name)
+        if index_config is None:
+            raise ValueError(f"Unknown shard index '{name}'!")
+
+        connections = [
+            connection
+            for connection in self.connections
+            if self._discovery_query(name, connection)
+        ]
+        if not force:
+            connections = self.shard_index.stale(
+                name, connections, index_config.get("max_age", 3600)
+            )
+        if not connections:
+            return []
+
+        self.logger.info(
+            f"Discovering '{name}' keys on {len(connections)} connection(s)"
+        )
+
+        def _discover(connection: str) -> dict[str, Any]:
+            return self.execute_query(
+                self._discovery_query(name, connection), connection, QueryType.DQL
+            )
+
+        refreshed = []
+        with ThreadPoolExecutor(max_workers=self.configurations.max_workers) as pool:
+            futures = {pool.submit(_discover, c): c for c in connections}
+            for future in as_completed(futures):
+                connection = futures[future]
+                result = future.result()
+                if not result["success"]:
+                    # Left unindexed, so the connection is still queried.
+                    self.logger.warning(
+                        f"Could not discover '{name}' keys on {connection}"
+                    )
+                    continue
+                df = result["data"]
+                keys = df.iloc[:, 0].dropna().unique() if len(df.columns) else []
+                self.shard_index.set(name, connection, keys)
+                refreshed.append(connection)
+
+        self.shard_index.save()
+
+        return refreshed
+
+    def route_by_key(self: "DBConnectionRunner", name: str, value: Any) -> list[str]:
+        """
+        Returns the connections that may hold a routing key value, refreshing
+        the shard index first if it has expired.
+
+        Args:
+            name: The index name, a table under `[shard_index]`.
+            value: The key value.
+
+        Returns:
+            The connections to query, in configuration order.
+        """
+        self.refresh_shard_index(name)
+        routed = self.shard_index.lookup(name, value, self.connections)
+        self.logger.info(
+            f"Routing key {name}={value} matches {len(routed)} of "
+            f"{len(self.connections)} connection(s)"
+        )
+
+        return routed
+
+    def probe(self: "DBConnectionRunner") -> dict[str, dict[str, Any]]:
+        """
+        Checks every connection in parallel with a trivial query and refreshes
+        the health store, regardless of breaker state.
+
+        Returns:
+            A dictionary mapping each connection to its probe result.
+        """
+        probe_queries = {"oracle": "SELECT 1 FROM DUAL"}
+
+        def _probe(connection: str) -> dict[str, Any]:
+            query = probe_queries.get(self.connections[connection].type, "SELECT 1")
+            start = time.perf_counter()
+            try:
+                with self.engines[connection].connect() as conn:
+                    conn.execute(text(query))
+            except Exception as e:
+                self.health.record_failure(connection, e)
+                return {"success": False, "latency": None, "error": e}
+
+            latency = time.perf_counter() - start
+            self.health.record_success(connection, latency)
+            return {"success": True, "latency": latency, "error": None}
+
+        results = {}
+        with ThreadPoolExecutor(
+            max_workers=self.configurations.max_workers
+        ) as executor:
+            future_results = {
+                executor.submit(_probe, connection): connection
+                for connection in self.connections
+            }
+            for future in as_completed(future_results):
+                results[future_results[future]] = future.result()
+
+        self.health.save()
+
+        return results
+
+    def inspect_schemas(
+        self: "DBConnectionRunner", refresh: bool = False
+    ) -> dict[str, dict[str, Any]]:
+        """
+        Fetches the catalog schema of every connection in parallel, reusing
+        cached schemas younger than `schema.max_age` unless `refresh` is set.
+
+        Args:
+            refresh: Whether to ignore cached schemas.
+
+        Returns:
+            A dictionary mapping each connection to its schema entry
+            (fingerprint, fetched_at and schema).
+        """
+        schema_config = self.configurations.get("schema", Struct())
+        cache = SchemaCache(Path(".cache/schemas"), schema_config.get("max_age", 86400))
+
+        def _inspect(connection: str) -> dict[str, Any]:
+            entry = None if refresh else cache.load(self.environment, connection)
+            if entry is None:
+                schema = fetch_schema(self.engines[connection])
+                entry = cache.save(self.environment, connection, schema)
+            return entry
+
+        entries = {}
+        with ThreadPoolExecutor(
+            max_workers=self.configurations.max_workers
+        ) as executor:
+            future_results = {
+                executor.submit(_inspect, connection): connection
+                for connection in self._plan_connections({})
+            }
+            for future in as_completed(future_results):
+                connection = future_results[future]
+                try:
+                    entries[connection] = future.result()
+                except Exception as e:
+                    self.logger.error(
+                        f"xxx FAILED schema inspection on connection: {connection} | Error: {e}"
+                    )
+
+        return entries
+
+    def schema_report(
+        self: "DBConnectionRunner", refresh: bool = False
+    ) -> pd.DataFrame:
+        """
+        Reports schema drift across connections.
+
+        Args:
+            refresh: Whether to ignore cached schemas.
+
+        Returns:
+            A DataFrame with one row per difference from the majority schema.
+        """
+        entries = self.inspect_schemas(refresh)
+        fingerprints = {}
+        for connection, entry in sorted(entries.items()):
+            fingerprints.setdefault(entry["fingerprint"], []).append(connection)
+        for fingerprint, connections in fingerprints.items():
+            self.logger.info(f"Schema {fingerprint}: {', '.join(connections)}")
+
+        return compare_schemas(
+            {connection: entry["schema"] for connection, entry in entries.items()}
+        )
+
+    def validate_result_schema(
+        self: "DBConnectionRunner", query: str, connections: list[str]
+    ) -> dict[str, SchemaMismatchError]:
+        """
+        Describes a query's result on every connection without fetching rows
+        and flags the connections that deviate from the majority.
+
+        Column names are compared across all connections; driver type codes
+        are only comparable between connections of the same driver type.
+
+        Args:
+            query: The query to validate.
+            connections: The connections to validate on.
+
+        Returns:
+            A dictionary mapping each mismatched connection to its error.
+        """
+        described = {}
+        with ThreadPoolExecutor(
+            max_workers=self.configurations.max_workers
+        ) as executor:
+            future_results = {
+                executor.submit(
+                    fetch_result_schema, self.engines[connection], query
+                ): connection
+                for connection in connections
+            }
+            for future in as_completed(future_results):
+                connection = future_results[future]
+                try:
+                    described[connection] = future.result()
+                except Exception as e:
+                    # Connection errors are left to the actual run to report.
+                    self.logger.warning(
+                        f"Could not describe result on {connection}: {e}"
+                    )
+
+        if not described:
+            return {}
+
+        names = {c: tuple(name for name, _ in d) for c, d in described.items()}
+        expected_names = Counter(names.values()).most_common(1)[0][0]
+
+        expected_types = {}
+        for driver in {self.connections[c].type for c in described}:
+            driver_types = [
+                tuple(type_code for _, type_code in d)
+                for c, d in described.items()
+                if self.connections[c].type == driver and names[c] == expected_names
+            ]
+            if driver_types:
+                expected_types[driver] = Counter(driver_types).most_common(1)[0][0]
+
+        mismatches = {}
+        for connection, description in described.items():
+            if names[connection] != expected_names:
+                mismatches[connection] = SchemaMismatchError(
+                    f"Result columns on {connection} {list(names[connection])} "
+                    f"differ from {list(expected_names)}"
+                )
+                continue
+
+            types = tuple(type_code for _, type_code in description)
+            expected = expected_types.get(self.connections[connection].type)
+            if expected is not None and types != expected:
+                columns = [
+                    name
+                    for (name, actual), wanted in zip(description, expected)
+                    if actual != wanted
+                ]
+                mismatches[connection] = SchemaMismatchError(
+                    f"Result column types on {connection} differ for: {columns}"
+                )
+
+        return mismatches
+
     def execute_query_multi_db(
         self: "DBConnectionRunner",
         query: str,
         commit: bool = False,
         ignore_cache: bool = False,
-    ) -> pd.DataFrame:
+        incremental: Optional[str] = None,
+        allow_spill: bool = True,
+        partition: Optional[PartitionPlan] = None,
+        routing_key: Optional[tuple[str, Any]] = None,
+    ) -> Union[pd.DataFrame, SpilledResult]:
         """
         Executes a query on multiple database connections.
 
+        When the results outgrow the `[memory]` budget, arriving results are
+        spilled to disk and a lazily read SpilledResult is returned instead
+        of a DataFrame.
+
+        In incremental mode the highest value of the `incremental` column is
+        stored per connection after each run. The next run only fetches rows
+        above each connection's mark and appends them to the cached result.
+
         Args:
             query: The query to execute.
             commit: Whether to commit the transaction.
-            ignore_cache: Whether to ignore the cache.
+            ignore_cache: Whether to ignore the cache. In incremental mode this
+                forces a full extraction.
+            incremental: The monotonic watermark column (e.g. an id or an
+                updated_at timestamp), enabling incremental mode.
+            allow_spill: Whether results may be spilled to disk. Callers that
+                need a DataFrame pass False.
+            partition: A plan to split each connection's query into
+                concurrent partition subqueries.
+            routing_key: A (shard index, value) pair. Only the connections
+                the index lists for the value are queried, so the query
+                should filter on that key.
 
         Returns:
             A tuple containing a DataFrame with the results and a dictionary with any errors that occurred.
         """
-        if not ignore_cache:
-            run_hash = hashlib.sha256(
-                f"{query}{','.join(self.connections)}".encode()
-            ).hexdigest()
-            cache_root = f".cache/{run_hash}"
-            cache_path = Path(f"{cache_root}.parquet")
-            cache_path.parent.mkdir(parents=True, exist_ok=True)
-
-            if cache_path.exists():
-                return pd.read_parquet(f"{cache_root}.parquet")
-
-        data = {}
         failed_extractions = {}
         query_type = self.verify_query_type(query)
-        self.logger.info(f"Running query of type: {query_type}")
-        if self.configurations.parallel:
-            with ThreadPoolExecutor(
-                max_workers=self.configurations.max_workers
-            ) as executor:
-                future_results = {}
-                for connection, config in self.connections.items():
-                    future = executor.submit(
-                        self.execute_query, query, connection, query_type, commit
+        unifier = (
+            SchemaUnifier() if self.configurations.get("unify_dtypes", True) else None
+        )
+        memory_config = self.configurations.get("memory", Struct())
+        data = SpillBuffer(
+            memory_config.get("budget_mb", 0) * 1024 * 1024 if allow_spill else 0,
+            Path(memory_config.get("spill_path", ".cache/spill")),
+        )
+        run_hash = self._run_hash(query)
+        previous = None
+        watermarks = {}
+
+        if incremental is not None:
+            if query_type != QueryType.DQL:
+                raise ValueError("Incremental runs only support SELECT queries!")
+            if not ignore_cache:
+                previous = self.load_cached_result(query)
+            if previous is not None:
+                watermarks = self.watermarks.get(run_hash, incremental)
+            if not watermarks:
+                # Without marks for this column the cached result cannot be
+                # extended, so this run is a full extraction.
+                previous = None
+            else:
+                self.logger.info(
+                    f"Incremental run from {len(watermarks)} stored watermark(s)"
+                )
+                # The previous result goes first, so it shapes the unified
+                # dtypes and is spilled like any other result.
+                if unifier is not None:
+                    previous = unifier.unify(previous)
+                data["__previous__"] = previous
+        elif not ignore_cache and query_type == QueryType.DQL:
+            cached = self.load_cached_result(query)
+            if cached is not None:
+                return cached
+
+            if self.configurations.cache:
+                # Either wait for an identical run elsewhere or take its lease,
+                # which the cache writer releases once this run is cached.
+                coalesced = self.cache.single_flight(run_hash)
+                if coalesced is not None:
+                    df, self.failed_extractions = coalesced
+                    return df
+
+        # A run that fails before its result is queued for the cache would
+        # otherwise keep its single-flight lease, and identical runs would
+        # wait on it until it goes stale.
+        try:
+            self.logger.info(f"Running query of type: {query_type}")
+            fingerprint = query_fingerprint(query)
+            routed = None
+            if routing_key is not None:
+                routed = self.route_by_key(*routing_key)
+            connections = self._plan_connections(
+                failed_extractions, fingerprint, routed
+            )
+
+            schema_config = self.configurations.get("schema", Struct())
+            if schema_config.get("validate", False) and query_type == QueryType.DQL:
+                mismatches = self.validate_result_schema(query, connections)
+                for connection, error in mismatches.items():
+                    self.logger.error(f"xxx Schema mismatch: {error}")
+                if mismatches and schema_config.get("on_mismatch", "skip") == "error":
+                    raise SchemaMismatchError(
+                        "; ".join(str(error) for error in mismatches.values())
                     )
-                    future_results[future] = config["name"]
+                failed_extractions.update(mismatches)
+                connections = [c for c in connections if c not in mismatches]
 
-                for future in as_completed(future_results):
-                    connection = future_results[future]
-                    result = future.result()
-                    data, failed_extractions = self._process_results(
-                        result,
+            process_pool = None
+
+            def _run(connection: str) -> dict[str, Any]:
+                if connection not in watermarks:
+                    return self._timed_execute_query(
+                        query,
                         connection,
-                        data,
-                        failed_extractions,
-                        self.configurations.column_name,
+                        query_type,
+                        commit,
+                        fingerprint,
+                        process_pool,
+                        partition=partition,
                     )
 
-        else:
-            for connection, config in self.connections.items():
-                result = self.execute_query(query, connection, query_type, commit)
+                delta_query = (
+                    f"SELECT * FROM ({strip_query(query)}) {SUBQUERY_ALIAS} "
+                    f"WHERE {incremental} > :watermark"
+                )
+                return self._timed_execute_query(
+                    delta_query,
+                    connection,
+                    query_type,
+                    commit,
+                    fingerprint,
+                    process_pool,
+                    {"watermark": watermarks[connection]},
+                    partition,
+                )
+
+            fetched_rows = 0
+
+            def _collect(connection: str, result: dict[str, Any]):
+                nonlocal data, failed_extractions, fetched_rows
+                if incremental is not None and result.get("data") is not None:
+                    fetched_rows += len(result["data"])
+                    mark = self.watermarks.high_water_mark(result["data"], incremental)
+                    if mark is not None:
+                        watermarks[connection] = mark
+
                 data, failed_extractions = self._process_results(
                     result,
                     connection,
                     data,
                     failed_extractions,
                     self.configurations.column_name,
+                    unifier,
+                )
+
+            if self.configurations.parallel:
+                if (
+                    self.configurations.get("execution_mode", "thread") == "process"
+                    and query_type == QueryType.DQL
+                ):
+                    process_pool = ProcessPoolExecutor(
+                        max_workers=self.configurations.max_workers
+                    )
+
+                try:
+                    # Partitioned reads hold several sessions, each charged to the
+                    # connection's limits.
+                    weights = None
+                    if partition is not None and query_type == QueryType.DQL:
+                        weights = {
+                            c: self._partition_sessions(c, partition)
+                            for c in connections
+                        }
+                    results = self._scheduler().run(
+                        connections, _run, self._limit_keys(), weights
+                    )
+                    for connection, result in results:
+                        _collect(connection, result)
+                finally:
+                    if process_pool is not None:
+                        process_pool.shutdown()
+
+            else:
+                for connection in connections:
+                    _collect(connection, _run(connection))
+
+            self.health.save()
+            self.runtimes.save()
+            self.failed_extractions = failed_extractions
+
+            if incremental is not None:
+                self.logger.info(f"Fetched {fetched_rows} new row(s)")
+
+            with stage("concat"):
+                df = data.finish(unifier)
+
+            # Incremental runs always cache, as the cached result is the base the
+            # next delta is appended to. The watermarks are only saved once the
+            # cache entry is committed, so a crash in between re-fetches rows
+            # instead of losing them.
+            def _save_watermarks():
+                self.watermarks.set(run_hash, incremental, watermarks)
+                self.watermarks.save()
+
+            if (
+                self.configurations.cache or incremental is not None
+            ) and query_type == QueryType.DQL:
+                self._cache_query_result(
+                    query,
+                    df,
+                    failed_extractions,
+                    run_hash,
+                    _save_watermarks if incremental is not None else None,
+                )
+        except BaseException:
+            self.cache.release(run_hash)
+            raise
+
+        return df
+
+    def preview_query(
+        self: "DBConnectionRunner", query: str, connection: str, rows: int
+    ) -> dict[str, Any]:
+        """
+        Fetches at most `rows` rows of a query from a single connection.
+
+        The query runs on a server-side cursor that is closed right after the
+        first batch, so the rest of the result is never transferred.
+
+        Args:
+            query: The query to preview.
+            connection: The name of the connection to preview on.
+            rows: The maximum number of rows to fetch.
+
+        Returns:
+            A dictionary containing the preview rows.
+        """
+        self.logger.info(f"--> Previewing query on connection: {connection}")
+        try:
+            with self.engines[connection].connect() as conn:
+                result = conn.execution_options(stream_results=True).execute(
+                    text(query)
                 )
+                try:
+                    columns = list(result.keys())
+                    batch = result.fetchmany(rows)
+                finally:
+                    result.close()
+        except Exception as e:
+            self.logger.error(
+                f"xxx FAILED preview on connection: {connection} | Error: {e}"
+            )
+            return {"success": False, "error": e}
+
+        return {"success": True, "data": pd.DataFrame(batch, columns=columns)}
+
+    def preview_query_multi_db(
+        self: "DBConnectionRunner",
+        query: str,
+        rows: int,
+        sample: Optional[int] = None,
+        ignore_cache: bool = False,
+    ) -> pd.DataFrame:
+        """
+        Previews a query: at most `rows` rows from each connection, optionally
+        from a random subset of `sample` connections. Previews are not cached,
+        but when the full result is, the preview is read from it instead of
+        the connections.
+
+        Args:
+            query: The query to preview.
+            rows: The maximum number of rows per connection.
+            sample: The number of connections to sample, or None for all.
+            ignore_cache: Whether to ignore the cache.
+
+        Returns:
+            A DataFrame with the preview rows.
+        """
+        if self.verify_query_type(query) != QueryType.DQL:
+            raise ValueError("Preview is only supported for SELECT queries!")
+        if rows < 1:
+            raise ValueError("Preview rows must be a positive integer!")
+
+        if not ignore_cache:
+            cached = self.load_cached_result(query, rows=rows)
+            if cached is not None:
+                self.logger.info("Preview read from the cached result")
+                column = self.configurations.column_name
+                if sample is not None and column in cached.columns:
+                    present = list(cached[column].unique())
+                    if sample < len(present):
+                        chosen = random.sample(present, sample)
+                        cached = cached[cached[column].isin(chosen)]
+                return cached.reset_index(drop=True)
+
+        data = {}
+        failed_extractions = {}
+        connections = self._plan_connections(failed_extractions)
+        if sample is not None and sample < len(connections):
+            connections = random.sample(connections, sample)
+
+        unifier = (
+            SchemaUnifier() if self.configurations.get("unify_dtypes", True) else None
+        )
+        results = self._scheduler().run(
+            connections,
+            lambda connection: self.preview_query(query, connection, rows),
+            self._limit_keys(),
+        )
+        for connection, result in results:
+            data, failed_extractions = self._process_results(
+                result,
+                connection,
+                data,
+                failed_extractions,
+                self.configurations.column_name,
+                unifier,
+            )
 
+        self.failed_extractions = failed_extractions
         if not data:
-            df = pd.DataFrame()
-        else:
-            df = pd.concat(data.values(), ignore_index=True)
+            return pd.DataFrame()
+        if unifier is not None:
+            return unifier.concat(data.values())
+        return pd.concat(data.values(), ignore_index=True)
 
-        if self.configurations.cache:
-            run_hash = hashlib.sha256(
-                f"{query}{','.join(self.connections)}".encode()
-            ).hexdigest()
-            self._cache_query_result(query, df, failed_extractions, run_hash)
+    def execute_dml_coordinated(
+        self: "DBConnectionRunner",
+        query: str,
+        commit: bool = False,
+        min_rows: Optional[int] = None,
+        max_rows: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """
+        Executes a DML query on every connection inside open transactions and
+        commits everywhere only if every connection succeeded and affected a
+        number of rows within bounds; otherwise every connection rolls back.
+
+        With `commit` disabled this is a dry run that reports the affected
+        rows per connection in one parallel pass. With `dml.two_phase`
+        enabled, PostgreSQL and MySQL transactions are prepared (PREPARE
+        TRANSACTION / XA PREPARE) before the decision, so a shard that
+        accepted the change can no longer refuse the commit.
+
+        Args:
+            query: The DML query to execute.
+            commit: Whether to commit when every connection is within bounds.
+            min_rows: The minimum rows each connection must affect.
+            max_rows: The maximum rows each connection may affect.
+
+        Returns:
+            A DataFrame reporting rowcount, status and error per connection.
+        """
+        if self.verify_query_type(query) != QueryType.DML:
+            raise ValueError("Coordinated execution is only supported for DML queries!")
+
+        two_phase = self.configurations.get("dml", Struct()).get("two_phase", False)
+        failed_extractions = {}
+        connections = self._plan_connections(failed_extractions)
+        open_transactions = {}
+        report = {
+            connection: {"rowcount": None, "status": "skipped", "error": str(error)}
+            for connection, error in failed_extractions.items()
+        }
+
+        def _execute(connection: str) -> dict[str, Any]:
+            conn = self.engines[connection].connect()
+            try:
+                if two_phase and self.connections[connection].type in [
+                    "postgresql",
+                    "mysql",
+                ]:
+                    transaction = conn.begin_twophase()
+                else:
+                    transaction = conn.begin()
+                rowcount = conn.execute(text(query)).rowcount
+                if hasattr(transaction, "prepare"):
+                    transaction.prepare()
+            except Exception as e:
+                conn.close()
+                return {"success": False, "error": e}
+
+            return {
+                "success": True,
+                "conn": conn,
+                "transaction": transaction,
+                "rowcount": rowcount,
+            }
+
+        for connection, result in self._scheduler().run(
+            connections, _execute, self._limit_keys()
+        ):
+            if result["success"]:
+                self.logger.info(
+                    f"<-- {result['rowcount']} rows affected on connection: {connection}"
+                )
+                open_transactions[connection] = result
+                report[connection] = {
+                    "rowcount": result["rowcount"],
+                    "status": "pending",
+                    "error": None,
+                }
+            else:
+                self.logger.error(
+                    f"xxx FAILED query on connection: {connection} | Error: {result['error']}"
+                )
+                failed_extractions[connection] = result["error"]
+                report[connection] = {
+                    "rowcount": None,
+                    "status": "failed",
+                    "error": str(result["error"]),
+                }
+
+        out_of_bounds = [
+            connection
+            for connection, result in open_transactions.items()
+            if result["rowcount"] < 0
+            or (min_rows is not None and result["rowcount"] < min_rows)
+            or (max_rows is not None and result["rowcount"] > max_rows)
+        ]
+        for connection in out_of_bounds:
+            self.logger.warning(
+                f"Rowcount {report[connection]['rowcount']} on {connection} is out of bounds"
+            )
+            report[connection]["error"] = "rowcount out of bounds"
+
+        do_commit = commit and not failed_extractions and not out_of_bounds
+        if commit and not do_commit:
+            self.logger.warning(
+                "Coordinated DML aborted, rolling back every connection"
+            )
+
+        def _finish(connection: str) -> dict[str, Any]:
+            result = open_transactions[connection]
+            try:
+                if do_commit:
+                    result["transaction"].commit()
+                else:
+                    result["transaction"].rollback()
+                return {"success": True}
+            except Exception as e:
+                return {"success": False, "error": e}
+            finally:
+                result["conn"].close()
+
+        for connection, result in self._scheduler().run(
+            list(open_transactions), _finish, {}
+        ):
+            if result["success"]:
+                report[connection]["status"] = (
+                    "committed" if do_commit else "rolled back"
+                )
+            else:
+                self.logger.error(
+                    f"xxx FAILED to finish transaction on {connection}: {result['error']}"
+                )
+                failed_extractions[connection] = result["error"]
+                report[connection]["status"] = "failed"
+                report[connection]["error"] = str(result["error"])
+
+        self.failed_extractions = failed_extractions
+
+        return pd.DataFrame(
+            [
+                {self.configurations.column_name: connection, **entry}
+                for connection, entry in sorted(report.items())
+            ],
+            columns=[self.configurations.column_name, "rowcount", "status", "error"],
+        )
+
+    def execute_aggregate_multi_db(
+        self: "DBConnectionRunner",
+        query: str,
+        group_by: list[str],
+        aggregates: list[str],
+        ignore_cache: bool = False,
+    ) -> pd.DataFrame:
+        """
+        Aggregates a query across all connections by pushing partial
+        aggregates down to each connection and merging them centrally.
+
+        Args:
+            query: The query whose rows are aggregated.
+            group_by: The group-by key columns.
+            aggregates: The aggregates as `function:column` strings.
+            ignore_cache: Whether to ignore the cache.
+
+        Returns:
+            A DataFrame with one row per group across all connections.
+        """
+        if self.verify_query_type(query) != QueryType.DQL:
+            raise ValueError("Aggregation is only supported for SELECT queries!")
+
+        plan = AggregationPlan(group_by, aggregates)
+        partials = {}
+        failed_extractions = {}
+        for name, partial_query in plan.partial_queries(query).items():
+            self.logger.info(f"Running partial aggregate: {name}")
+            partials[name] = self.execute_query_multi_db(
+                partial_query, ignore_cache=ignore_cache, allow_spill=False
+            )
+            failed_extractions.update(self.failed_extractions)
+
+        self.failed_extractions = failed_extractions
+        if any(df.empty for df in partials.values()):
+            return pd.DataFrame(
+                columns=plan.group_by + [a.name for a in plan.aggregates]
+            )
+
+        return plan.merge(partials, self.configurations.column_name)
+
+    def execute_top_n_multi_db(
+        self: "DBConnectionRunner",
+        query: str,
+        order_by: list[str],
+        limit: int,
+    ) -> pd.DataFrame:
+        """
+        Returns the global top N rows of a query across all connections.
+
+        Every connection returns its own ordered top N through a server-side
+        cursor; the streams are k-way merged and each one is only read while
+        its rows can still make the global top N. When an ordering column
+        holds text, the streams are reopened ordered by binary collation, so
+        they are sorted the same way the merge compares them.
+
+        Args:
+            query: The query to execute.
+            order_by: The ordering columns as `column` or `column:desc`.
+            limit: The number of rows to return.
+
+        Returns:
+            A DataFrame with the global top N rows, in order.
+        """
+        if self.verify_query_type(query) != QueryType.DQL:
+            raise ValueError("Top-N merge is only supported for SELECT queries!")
+
+        plan = TopNPlan(order_by, limit)
+        failed_extractions = {}
+        connections = self._plan_connections(failed_extractions)
+        batch_size = min(limit, 500)
+
+        def _open_all(text_columns: list[str]) -> list[SortedStream]:
+            def _open(connection: str) -> SortedStream:
+                return SortedStream(
+                    self.engines[connection],
+                    connection,
+                    plan.rewrite(
+                        query, self.connections[connection].type, text_columns
+                    ),
+                    batch_size,
+                )
+
+            streams = []
+            with ThreadPoolExecutor(
+                max_workers=self.configurations.max_workers
+            ) as executor:
+                future_results = {
+                    executor.submit(_open, connection): connection
+                    for connection in connections
+                    if connection not in failed_extractions
+                }
+                for future in as_completed(future_results):
+                    connection = future_results[future]
+                    try:
+                        streams.append(future.result())
+                        self.logger.info(
+                            f"<-- Stream opened on connection: {connection}"
+                        )
+                    except Exception as e:
+                        self.logger.error(
+                            f"xxx FAILED query on connection: {connection} | Error: {e}"
+                        )
+                        if is_connectivity_error(e):
+                            self.health.record_failure(connection, e)
+                        failed_extractions[connection] = e
+
+            return streams
+
+        streams = _open_all([])
+        if streams:
+            # Text is only recognised once rows arrive, so streams ordered by
+            # the databases' own collations are replaced.
+            columns = streams[0].columns
+            text_columns = plan.text_columns(
+                columns, itertools.chain.from_iterable(s.buffered for s in streams)
+            )
+            if text_columns:
+                for stream in streams:
+                    stream.close()
+                streams = _open_all(text_columns)
+
+        self.failed_extractions = failed_extractions
+        if not streams:
+            return pd.DataFrame()
+
+        columns = streams[0].columns
+        try:
+            merged = heapq.merge(*streams, key=plan.sort_key(columns))
+            rows = list(itertools.islice(merged, limit))
+        finally:
+            for stream in streams:
+                stream.close()
+
+        df = pd.DataFrame([row for row, _ in rows], columns=columns)
+        df[self.configurations.column_name] = pd.Categorical(
+            [connection for _, connection in rows], categories=sorted(self.connections)
+        )
 
         return df
 
+    def close_all(self: "DBConnectionRunner"):
+        """
+        Waits for pending cache writes, releases any cache lease left by a
+        failed run, disposes of replica engines, then closes all the database
+        connections.
+        """
+        self.cache.flush()
+        self.cache.release_all()
+        self.routing.dispose()
+        super().close_all()
+
+    def _connection_tag(
+        self: "DBConnectionRunner", connection: str, length: int
+    ) -> pd.Categorical:
+        """
+        Builds the connection column for a connection's rows.
+
+        The column is dictionary-encoded with every configured connection as a
+        category, so each row costs one byte instead of a string pointer and
+        frames from different connections concatenate without re-encoding.
+
+        Args:
+            connection: The connection name.
+            length: The number of rows.
+
+        Returns:
+            A categorical with `length` copies of `connection`.
+        """
+        dtype = pd.CategoricalDtype(sorted(self.connections))
+        codes = np.full(length, dtype.categories.get_loc(connection))
+
+        return pd.Categorical.from_codes(codes, dtype=dtype)
+
     def _process_results(
         self: "DBConnectionRunner",
         result: dict[Any, Any],
@@ -239,13 +1567,17 @@ class DBConnectionRunner(DBConnectionManager):
         data: dict[str, pd.DataFrame],
         failed_extractions: dict[Any, Any],
         connection_column_name: str,
+        unifier: Optional[SchemaUnifier] = None,
     ) -> tuple[dict, dict]:
         if result["success"]:
             self.logger.info(f"<-- SUCCESS from connection: {connection}")
             # DML queries return None, so we handle that case
             if result.get("data") is not None:
                 df = result["data"]
-                df[connection_column_name] = connection
+                if unifier is not None:
+                    with stage("unify_dtypes"):
+                        df = unifier.unify(df)
+                df[connection_column_name] = self._connection_tag(connection, len(df))
                 data[connection] = df
         else:
             # Error is already logged in execute_query
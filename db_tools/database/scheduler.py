@@ -0,0 +1,223 @@
+import hashlib
+import json
+import re
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from concurrent.futures.thread import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+from ..logger import get_logger
+from .state import save_state, state_lock
+
+
+def query_fingerprint(query: str) -> str:
+    """
+    Computes a fingerprint that is stable across literal values and formatting.
+
+    Comments are stripped, string and numeric literals are replaced by
+    placeholders and whitespace is collapsed, so `WHERE id = 1` and
+    `WHERE id = 2` share runtime history.
+
+    Args:
+        query: The SQL query.
+
+    Returns:
+        A short hexadecimal fingerprint.
+    """
+    normalized = re.sub(r"--.*?$|/\*.*?\*/", "", query, flags=re.MULTILINE | re.DOTALL)
+    normalized = re.sub(r"'(?:[^']|'')*'", "?", normalized)
+    normalized = re.sub(r"\b\d+(?:\.\d+)?\b", "?", normalized)
+    normalized = re.sub(r"\s+", " ", normalized).strip().upper()
+
+    return hashlib.sha256(normalized.encode()).hexdigest()[:16]
+
+
+class RuntimeHistory:
+    """
+    Persists an exponentially weighted runtime per query fingerprint and
+    connection.
+    """
+
+    path: Path
+    alpha: float
+
+    def __init__(self: "RuntimeHistory", path: Path, alpha: float = 0.3):
+        """
+        Initializes a new RuntimeHistory object.
+
+        Args:
+            path: The JSON file the history is persisted to.
+            alpha: Weight of the newest observation in the moving average.
+        """
+        self.logger = get_logger(__name__)
+        self.path = Path(path)
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._changed: set[tuple[str, ...]] = set()
+        self._data: dict[str, dict[str, float]] = {}
+
+        if self.path.exists():
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._data = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                self.logger.warning(f"Could not read runtime history {self.path}: {e}")
+
+    def record(
+        self: "RuntimeHistory", fingerprint: str, connection: str, seconds: float
+    ):
+        """
+        Records an observed runtime.
+
+        Args:
+            fingerprint: The query fingerprint.
+            connection: The connection name.
+            seconds: The observed runtime.
+        """
+        with self._lock:
+            self._changed.add((fingerprint, connection))
+            runtimes = self._data.setdefault(fingerprint, {})
+            previous = runtimes.get(connection)
+            if previous is None:
+                runtimes[connection] = round(seconds, 4)
+            else:
+                runtimes[connection] = round(
+                    self.alpha * seconds + (1 - self.alpha) * previous, 4
+                )
+
+    def expected(
+        self: "RuntimeHistory",
+        fingerprint: str,
+        connection: str,
+        fallback: bool = True,
+    ) -> Optional[float]:
+        """
+        Returns the expected runtime of a query on a connection.
+
+        Falls back to the connection's mean runtime across all fingerprints
+        when the query has never run there, unless `fallback` is False.
+        """
+        runtime = self._data.get(fingerprint, {}).get(connection)
+        if runtime is not None or not fallback:
+            return runtime
+
+        observed = [
+            runtimes[connection]
+            for runtimes in self._data.values()
+            if connection in runtimes
+        ]
+        if not observed:
+            return None
+
+        return sum(observed) / len(observed)
+
+    def longest_first(
+        self: "RuntimeHistory", fingerprint: str, connections: list[str]
+    ) -> list[str]:
+        """
+        Orders connections by expected runtime, longest first (LPT).
+
+        Connections without history are scheduled first, since they are as
+        likely as any to be the long pole. The relative order of ties is kept.
+        """
+        expected = {c: self.expected(fingerprint, c) for c in connections}
+        return sorted(
+            connections,
+            key=lambda c: float("inf") if expected[c] is None else expected[c],
+            reverse=True,
+        )
+
+    def save(self: "RuntimeHistory"):
+        """
+        Writes the runtimes this history recorded to disk, keeping what other
+        histories saved for the rest.
+        """
+        with state_lock(self.path), self._lock:
+            self._data = save_state(self.path, self._data, self._changed)
+            self._changed.clear()
+
+
+class ConnectionScheduler:
+    """
+    Submits per-connection jobs to a thread pool in a given order while
+    enforcing concurrency limits shared by groups of connections.
+
+    Jobs whose limits are saturated are held back by the scheduler instead of
+    blocking a worker thread, so a busy host never starves the others.
+    """
+
+    max_workers: int
+    limits: dict[str, int]
+
+    def __init__(
+        self: "ConnectionScheduler",
+        max_workers: int,
+        limits: Optional[dict[str, int]] = None,
+    ):
+        """
+        Initializes a new ConnectionScheduler object.
+
+        Args:
+            max_workers: The maximum number of concurrent jobs overall.
+            limits: Maximum concurrent jobs per limit key (e.g. "host:db1").
+        """
+        self.max_workers = max_workers
+        self.limits = {key: max(1, limit) for key, limit in (limits or {}).items()}
+
+    def run(
+        self: "ConnectionScheduler",
+        connections: list[str],
+        fn: Callable[[str], Any],
+        keys: dict[str, list[str]],
+        weights: Optional[dict[str, int]] = None,
+    ) -> Iterator[tuple[str, Any]]:
+        """
+        Runs `fn` for every connection, yielding results as they complete.
+
+        Args:
+            connections: The connections to run, in preferred start order.
+            fn: The job, called with the connection name.
+            keys: The limit keys each connection counts against.
+            weights: How many slots of each of its limits a connection's job
+                takes (e.g. its concurrent sessions), 1 by default. A weight
+                above a limit takes the whole limit.
+
+        Yields:
+            Tuples of connection name and job result.
+        """
+        pending = list(connections)
+        in_use: dict[str, int] = {}
+        running: dict[Future, str] = {}
+        weights = weights or {}
+
+        def _slots(connection: str, key: str) -> int:
+            weight = weights.get(connection, 1)
+            return min(weight, self.limits[key]) if key in self.limits else weight
+
+        def _has_capacity(connection: str) -> bool:
+            return all(
+                in_use.get(key, 0) + _slots(connection, key) <= self.limits[key]
+                for key in keys.get(connection, [])
+                if key in self.limits
+            )
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                for connection in list(pending):
+                    if len(running) >= self.max_workers:
+                        break
+                    if not _has_capacity(connection):
+                        continue
+
+                    pending.remove(connection)
+                    for key in keys.get(connection, []):
+                        in_use[key] = in_use.get(key, 0) + _slots(connection, key)
+                    running[executor.submit(fn, connection)] = connection
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    connection = running.pop(future)
+                    for key in keys.get(connection, []):
+                        in_use[key] -= _slots(connection, key)
+                    yield connection, future.result()
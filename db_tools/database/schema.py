@@ -0,0 +1,192 @@
+import hashlib
+import json
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Optional
+
+import pandas as pd
+from sqlalchemy import inspect
+from sqlalchemy.engine.base import Engine
+from sqlalchemy.sql._elements_constructors import text
+
+from ..logger import get_logger
+from .aggregation import SUBQUERY_ALIAS, strip_query
+
+# {table: {column: type}}
+Schema = dict[str, dict[str, str]]
+
+
+class SchemaMismatchError(Exception):
+    """
+    Raised when connections disagree on the schema of a query's result.
+    """
+
+
+def fetch_schema(engine: Engine) -> Schema:
+    """
+    Reads the tables and columns of a connection's default schema.
+
+    Args:
+        engine: The connection's engine.
+
+    Returns:
+        A mapping of table name to a mapping of column name to type.
+    """
+    inspector = inspect(engine)
+    multi_columns = inspector.get_multi_columns()
+
+    return {
+        table: {column["name"]: str(column["type"]) for column in columns}
+        for (_, table), columns in sorted(multi_columns.items())
+    }
+
+
+def schema_fingerprint(schema: Schema) -> str:
+    """
+    Returns a stable hash of a schema.
+    """
+    payload = json.dumps(schema, sort_keys=True).encode()
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+def compare_schemas(schemas: dict[str, Schema]) -> pd.DataFrame:
+    """
+    Reports where connections deviate from the most common schema.
+
+    Each table and column is compared against what the majority of
+    connections have, so a single drifted shard stands out.
+
+    Args:
+        schemas: The schema of each connection.
+
+    Returns:
+        A DataFrame with one row per difference: connection, table, column,
+        issue, expected and actual.
+    """
+    rows = []
+    total = len(schemas)
+    table_counts = Counter(table for schema in schemas.values() for table in schema)
+
+    for table, count in sorted(table_counts.items()):
+        majority_table = count * 2 > total
+        column_types: dict[str, Counter] = {}
+        for schema in schemas.values():
+            for column, column_type in schema.get(table, {}).items():
+                column_types.setdefault(column, Counter())[column_type] += 1
+
+        for connection, schema in sorted(schemas.items()):
+            if table not in schema:
+                if majority_table:
+                    rows.append([connection, table, None, "missing table", None, None])
+                continue
+            if not majority_table:
+                rows.append([connection, table, None, "extra table", None, None])
+                continue
+
+            for column, types in sorted(column_types.items()):
+                expected = types.most_common(1)[0][0]
+                majority_column = sum(types.values()) * 2 > count
+                actual = schema[table].get(column)
+
+                if actual is None and majority_column:
+                    rows.append(
+                        [connection, table, column, "missing column", expected, None]
+                    )
+                elif actual is not None and not majority_column:
+                    rows.append(
+                        [connection, table, column, "extra column", None, actual]
+                    )
+                elif actual is not None and actual != expected:
+                    rows.append(
+                        [connection, table, column, "type mismatch", expected, actual]
+                    )
+
+    return pd.DataFrame(
+        rows, columns=["connection", "table", "column", "issue", "expected", "actual"]
+    )
+
+
+def fetch_result_schema(engine: Engine, query: str) -> list[tuple[str, Any]]:
+    """
+    Returns the column names and driver type codes of a query's result
+    without fetching any rows.
+
+    Args:
+        engine: The connection's engine.
+        query: The query to describe.
+
+    Returns:
+        A list of (column name, type code) tuples, in result order.
+    """
+    probe = f"SELECT * FROM ({strip_query(query)}) {SUBQUERY_ALIAS} WHERE 1 = 0"
+    with engine.connect() as conn:
+        result = conn.execute(text(probe))
+        description = result.cursor.description or []
+        result.close()
+
+    return [(column[0], column[1]) for column in description]
+
+
+class SchemaCache:
+    """
+    Caches per-connection schemas and fingerprints on disk.
+    """
+
+    root: Path
+    max_age: float
+
+    def __init__(self: "SchemaCache", root: Path, max_age: float = 86400):
+        """
+        Initializes a new SchemaCache object.
+
+        Args:
+            root: The directory cached schemas are stored in.
+            max_age: Seconds after which a cached schema is refreshed.
+        """
+        self.logger = get_logger(__name__)
+        self.root = Path(root)
+        self.max_age = max_age
+
+    def _path(self: "SchemaCache", environment: str, connection: str) -> Path:
+        return self.root / environment / f"{connection}.json"
+
+    def load(
+        self: "SchemaCache", environment: str, connection: str
+    ) -> Optional[dict[str, Any]]:
+        """
+        Returns a cached schema entry, or None if it is missing or stale.
+        """
+        path = self._path(environment, connection)
+        if not path.exists():
+            return None
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            self.logger.warning(f"Could not read cached schema {path}: {e}")
+            return None
+
+        if time.time() - entry["fetched_at"] > self.max_age:
+            return None
+
+        return entry
+
+    def save(
+        self: "SchemaCache", environment: str, connection: str, schema: Schema
+    ) -> dict[str, Any]:
+        """
+        Caches a schema and returns the stored entry.
+        """
+        entry = {
+            "fingerprint": schema_fingerprint(schema),
+            "fetched_at": time.time(),
+            "schema": schema,
+        }
+        path = self._path(environment, connection)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, indent=2)
+
+        return entry
@@ -0,0 +1,134 @@
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Iterable
+
+import pandas as pd
+
+from ..logger import get_logger
+from .state import save_state, state_lock
+
+
+def shard_key(value: Any) -> str:
+    """
+    Normalizes a routing key value, so a key typed on the command line
+    matches the same key read from a database (e.g. "42", 42 and 42.0).
+    """
+    if isinstance(value, str):
+        return value.strip()
+    if pd.api.types.is_float(value) and float(value).is_integer():
+        return str(int(value))
+
+    return str(value)
+
+
+class ShardIndex:
+    """
+    Persists which key values (tenants, customers...) live on which
+    connection, per environment and index name.
+
+    Each connection's keys are read with a discovery query and expire after
+    `max_age` seconds, when they are read again on next use. Connections
+    whose keys are unknown (never discovered, or discovery failed) are
+    assumed to hold every key.
+    """
+
+    path: Path
+    environment: str
+
+    def __init__(self: "ShardIndex", path: Path, environment: str):
+        """
+        Initializes a new ShardIndex object.
+
+        Args:
+            path: The JSON file the index is persisted to.
+            environment: The environment the current run targets.
+        """
+        self.logger = get_logger(__name__)
+        self.path = Path(path)
+        self.environment = environment
+        self._lock = threading.Lock()
+        self._data: dict[str, Any] = {}
+        self._keys: dict[tuple[str, str], set[str]] = {}
+        self._changed: set[tuple[str, ...]] = set()
+
+        if self.path.exists():
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._data = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                self.logger.warning(f"Could not read shard index {self.path}: {e}")
+
+    def _entries(self: "ShardIndex", name: str) -> dict[str, Any]:
+        return self._data.setdefault(self.environment, {}).setdefault(name, {})
+
+    def stale(
+        self: "ShardIndex", name: str, connections: Iterable[str], max_age: float
+    ) -> list[str]:
+        """
+        Returns the connections whose keys are missing or older than `max_age`
+        seconds.
+        """
+        now = time.time()
+        with self._lock:
+            entries = self._entries(name)
+            return [
+                connection
+                for connection in connections
+                if connection not in entries
+                or now - entries[connection]["built_at"] > max_age
+            ]
+
+    def set(self: "ShardIndex", name: str, connection: str, keys: Iterable[Any]):
+        """
+        Stores the keys found on a connection.
+        """
+        normalized = sorted({shard_key(key) for key in keys})
+        with self._lock:
+            self._changed.add((self.environment, name, connection))
+            self._entries(name)[connection] = {
+                "built_at": time.time(),
+                "keys": normalized,
+            }
+            self._keys[(name, connection)] = set(normalized)
+
+    def lookup(
+        self: "ShardIndex", name: str, value: Any, connections: Iterable[str]
+    ) -> list[str]:
+        """
+        Returns the connections that may hold a key value.
+
+        Args:
+            name: The index name.
+            value: The key value.
+            connections: The candidate connections.
+
+        Returns:
+            The candidates known to hold the key, plus those not indexed.
+        """
+        key = shard_key(value)
+        with self._lock:
+            entries = self._entries(name)
+            routed = []
+            for connection in connections:
+                if connection not in entries:
+                    routed.append(connection)
+                    continue
+                if (name, connection) not in self._keys:
+                    self._keys[(name, connection)] = set(entries[connection]["keys"])
+                if key in self._keys[(name, connection)]:
+                    routed.append(connection)
+
+            return routed
+
+    def save(self: "ShardIndex"):
+        """
+        Writes the connections this index discovered to disk, keeping what
+        other indexes saved for the rest.
+        """
+        with state_lock(self.path), self._lock:
+            self._data = save_state(self.path, self._data, self._changed, None)
+            self._changed.clear()
+            # Entries other indexes saved may have replaced cached key sets.
+            self._keys.clear()
@@ -0,0 +1,289 @@
+import shutil
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Any, Iterator, Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ..logger import get_logger
+from ..profiling import stage
+from .dtypes import SchemaUnifier
+
+
+class SpilledResult:
+    """
+    A combined result stored as parquet files on disk and read lazily.
+
+    Files are read one batch at a time and cast to the unified dtypes on the
+    way out, so consumers that stream (CSV export, DuckDB post-queries, sinks
+    and the cache) never hold the whole result in memory.
+    """
+
+    directory: Path
+    paths: list[Path]
+    columns: pd.Index
+    target: dict[Any, Any]
+
+    def __init__(
+        self: "SpilledResult",
+        directory: Path,
+        paths: list[Path],
+        columns: pd.Index,
+        target: dict[Any, Any],
+        rows: int,
+    ):
+        """
+        Initializes a new SpilledResult object.
+
+        Args:
+            directory: The directory holding the spill files.
+            paths: The spill files, in result order.
+            columns: The columns of the result.
+            target: The dtype each column is cast to when read.
+            rows: The total number of rows.
+        """
+        self.directory = Path(directory)
+        self.paths = paths
+        self.columns = columns
+        self.target = target
+        self._rows = rows
+
+    def __len__(self: "SpilledResult") -> int:
+        return self._rows
+
+    @property
+    def empty(self: "SpilledResult") -> bool:
+        return self._rows == 0
+
+    def _align(
+        self: "SpilledResult", df: pd.DataFrame, columns: Optional[list] = None
+    ) -> pd.DataFrame:
+        df = df.reindex(columns=self.columns if columns is None else columns)
+        for column, dtype in self.target.items():
+            if column in df.columns and df[column].dtype != dtype:
+                try:
+                    df[column] = df[column].astype(dtype)
+                except (TypeError, ValueError):
+                    df[column] = df[column].astype(object)
+
+        return df
+
+    def iter_batches(
+        self: "SpilledResult", batch_size: int = 65_536
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Yields the result as DataFrames of at most `batch_size` rows.
+        """
+        for path in self.paths:
+            parquet_file = pq.ParquetFile(path)
+            schema = parquet_file.schema_arrow
+            for batch in parquet_file.iter_batches(batch_size=batch_size):
+                table = pa.Table.from_batches([batch], schema=schema)
+                yield self._align(table.to_pandas())
+
+    def head(
+        self: "SpilledResult",
+        rows: int,
+        columns: Optional[list[str]] = None,
+        group_column: Optional[str] = None,
+        batch_size: int = 65_536,
+    ) -> pd.DataFrame:
+        """
+        Reads the first `rows` rows, decoding only the requested columns.
+
+        Args:
+            rows: The maximum number of rows to read.
+            columns: The columns to read, or None for all.
+            group_column: When given, `rows` applies to each value of this
+                column (e.g. per connection), so every file is scanned.
+            batch_size: How many rows to decode at a time.
+
+        Returns:
+            The rows, in result order.
+        """
+        columns = list(self.columns) if columns is None else columns
+        grouped = group_column is not None and group_column in self.columns
+        needed = columns + [group_column] if grouped else columns
+        needed = list(dict.fromkeys(needed))
+
+        frames = []
+        taken: Counter = Counter()
+        total = 0
+        for path in self.paths:
+            parquet_file = pq.ParquetFile(path)
+            names = [c for c in needed if c in parquet_file.schema_arrow.names]
+            for batch in parquet_file.iter_batches(
+                batch_size=batch_size, columns=names
+            ):
+                df = self._align(batch.to_pandas(), needed)
+                if grouped:
+                    keep = []
+                    groups = df.groupby(
+                        group_column, observed=True, sort=False, dropna=False
+                    )
+                    for value, index in groups.indices.items():
+                        room = rows - taken[value]
+                        if room > 0:
+                            keep.extend(index[:room])
+                            taken[value] += min(room, len(index))
+                    df = df.iloc[sorted(keep)]
+                else:
+                    df = df.head(rows - total)
+                    total += len(df)
+                frames.append(df[columns])
+                if not grouped and total >= rows:
+                    break
+            if not grouped and total >= rows:
+                break
+
+        if not frames:
+            return self._align(pd.DataFrame(), columns)
+
+        return pd.concat(frames, ignore_index=True)
+
+    def to_arrow_reader(
+        self: "SpilledResult", batch_size: int = 65_536
+    ) -> pa.RecordBatchReader:
+        """
+        Returns the result as an Arrow record batch stream.
+        """
+        batches = self.iter_batches(batch_size)
+        first = next(batches, None)
+        if first is None:
+            first = self._align(pd.DataFrame())
+        schema = pa.Schema.from_pandas(first, preserve_index=False)
+
+        def _generate() -> Iterator[pa.RecordBatch]:
+            yield pa.RecordBatch.from_pandas(first, schema=schema, preserve_index=False)
+            for df in batches:
+                yield pa.RecordBatch.from_pandas(
+                    df, schema=schema, preserve_index=False
+                )
+
+        return pa.RecordBatchReader.from_batches(schema, _generate())
+
+    def to_parquet(self: "SpilledResult", path: Union[str, Path]):
+        """
+        Writes the result to a single parquet file, batch by batch.
+        """
+        reader = self.to_arrow_reader()
+        with pq.ParquetWriter(path, reader.schema) as writer:
+            for batch in reader:
+                writer.write_batch(batch)
+
+    def to_pandas(self: "SpilledResult") -> pd.DataFrame:
+        """
+        Loads the whole result into memory.
+        """
+        frames = list(self.iter_batches())
+        if not frames:
+            return self._align(pd.DataFrame())
+
+        return pd.concat(frames, ignore_index=True)
+
+    def cleanup(self: "SpilledResult"):
+        """
+        Deletes the spill files.
+        """
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class SpillBuffer:
+    """
+    Collects per-connection results under a memory budget.
+
+    Results are kept in memory until the next one would exceed the budget;
+    from then on arriving results are written to parquet files in a spill
+    directory instead. Supports item assignment, so it can stand in for the
+    `data` dict of a run.
+    """
+
+    budget: int
+    root: Path
+    frames: dict[str, pd.DataFrame]
+    memory: int
+    rows: int
+
+    def __init__(self: "SpillBuffer", budget: int, root: Path):
+        """
+        Initializes a new SpillBuffer object.
+
+        Args:
+            budget: The memory budget in bytes. Zero or less disables spilling.
+            root: The directory spill directories are created in.
+        """
+        self.logger = get_logger(__name__)
+        self.budget = budget
+        self.root = Path(root)
+        self.frames = {}
+        self.memory = 0
+        self.rows = 0
+        self._directory: Optional[Path] = None
+        self._paths: list[Path] = []
+        self._columns: Optional[pd.Index] = None
+
+    def __len__(self: "SpillBuffer") -> int:
+        return len(self.frames) + len(self._paths)
+
+    def __setitem__(self: "SpillBuffer", key: str, df: pd.DataFrame):
+        if self._columns is None:
+            self._columns = df.columns
+        self.rows += len(df)
+
+        size = int(df.memory_usage(deep=True).sum())
+        if self.budget <= 0 or self.memory + size <= self.budget:
+            self.frames[key] = df
+            self.memory += size
+            return
+
+        self.logger.warning(
+            f"Memory budget exceeded, spilling {len(df)} rows from {key} to disk"
+        )
+        self._spill(df)
+
+    def _spill(self: "SpillBuffer", df: pd.DataFrame):
+        if self._directory is None:
+            self._directory = self.root / uuid.uuid4().hex
+            self._directory.mkdir(parents=True, exist_ok=True)
+
+        path = self._directory / f"{len(self._paths):05d}.parquet"
+        with stage("spill"):
+            df.to_parquet(path, index=False)
+        self._paths.append(path)
+
+    @property
+    def spilled(self: "SpillBuffer") -> bool:
+        return bool(self._paths)
+
+    def finish(
+        self: "SpillBuffer", unifier: Optional[SchemaUnifier] = None
+    ) -> Union[pd.DataFrame, SpilledResult]:
+        """
+        Combines the collected results.
+
+        Returns:
+            A DataFrame if everything fit in the budget, otherwise a
+            SpilledResult over all results, including those kept in memory.
+        """
+        if not self.spilled:
+            if not self.frames:
+                return pd.DataFrame()
+            if unifier is not None:
+                return unifier.concat(self.frames.values())
+            return pd.concat(self.frames.values(), ignore_index=True)
+
+        for df in self.frames.values():
+            self._spill(df)
+        self.frames = {}
+        self.memory = 0
+
+        return SpilledResult(
+            self._directory,
+            self._paths,
+            self._columns,
+            dict(unifier.target) if unifier is not None else {},
+            self.rows,
+        )
@@ -0,0 +1,80 @@
+import json
+import threading
+import uuid
+from pathlib import Path
+from typing import Any
+
+_locks: dict[Path, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+_MISSING = object()
+
+
+def state_lock(path: Path) -> threading.Lock:
+    """
+    Returns the lock of a state file, shared by every store of this process
+    that persists to it (e.g. the runners of a daemon).
+    """
+    path = Path(path).resolve()
+    with _locks_guard:
+        return _locks.setdefault(path, threading.Lock())
+
+
+def _lookup(data: dict[str, Any], key: tuple[str, ...]) -> Any:
+    for part in key:
+        if not isinstance(data, dict) or part not in data:
+            return _MISSING
+        data = data[part]
+    return data
+
+
+def save_state(
+    path: Path,
+    data: dict[str, Any],
+    changed: set[tuple[str, ...]],
+    indent: int = 2,
+) -> dict[str, Any]:
+    """
+    Writes a store's changes to its JSON state file without losing those
+    other stores saved in the meantime.
+
+    The file is re-read and only the entries this store changed are
+    replaced (or removed, when they are gone from `data`), then it is
+    written to a unique temporary file and renamed into place. Callers hold
+    `state_lock(path)`.
+
+    Args:
+        path: The JSON state file.
+        data: The store's data.
+        changed: The key paths of the entries the store changed.
+        indent: The JSON indentation, or None for compact files.
+
+    Returns:
+        The merged data, which the store adopts.
+    """
+    merged: dict[str, Any] = {}
+    if path.exists():
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                merged = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            merged = {}
+
+    for key in changed:
+        value = _lookup(data, key)
+        parent = merged
+        for part in key[:-1]:
+            parent = parent.setdefault(part, {})
+        if value is _MISSING:
+            parent.pop(key[-1], None)
+        else:
+            parent[key[-1]] = value
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Unique per writer, so concurrent saves never share a temporary file.
+    tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(merged, f, indent=indent)
+    tmp_path.replace(path)
+
+    return merged
@@ -0,0 +1,139 @@
+import json
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Optional
+
+import pandas as pd
+
+from ..logger import get_logger
+from .state import save_state, state_lock
+
+
+def encode_watermark(value: Any) -> dict[str, Any]:
+    """
+    Converts a watermark value to a JSON-serializable form that keeps its type.
+    """
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return {"type": "datetime", "value": pd.Timestamp(value).isoformat()}
+    if isinstance(value, date):
+        return {"type": "date", "value": value.isoformat()}
+    if pd.api.types.is_integer(value):
+        return {"type": "int", "value": int(value)}
+    if pd.api.types.is_float(value):
+        return {"type": "float", "value": float(value)}
+
+    return {"type": "str", "value": str(value)}
+
+
+def decode_watermark(entry: dict[str, Any]) -> Any:
+    """
+    Restores a watermark value encoded by `encode_watermark`, as a type the
+    drivers can bind.
+    """
+    value = entry["value"]
+    if entry["type"] == "datetime":
+        return pd.Timestamp(value).to_pydatetime()
+    if entry["type"] == "date":
+        return date.fromisoformat(value)
+
+    return value
+
+
+class WatermarkStore:
+    """
+    Persists the high-water mark of incremental runs per run and connection.
+    """
+
+    path: Path
+
+    def __init__(self: "WatermarkStore", path: Path):
+        """
+        Initializes a new WatermarkStore object.
+
+        Args:
+            path: The JSON file the store is persisted to.
+        """
+        self.logger = get_logger(__name__)
+        self.path = Path(path)
+        self._changed: set[tuple[str, ...]] = set()
+        self._data: dict[str, dict[str, Any]] = {}
+
+        if self.path.exists():
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._data = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                self.logger.warning(f"Could not read watermarks {self.path}: {e}")
+
+    def get(self: "WatermarkStore", run_hash: str, column: str) -> dict[str, Any]:
+        """
+        Returns the watermark of each connection for a run.
+
+        Args:
+            run_hash: The cache key of the run.
+            column: The watermark column. Stored marks of another column are
+                ignored.
+
+        Returns:
+            A mapping of connection name to its decoded watermark.
+        """
+        entry = self._data.get(run_hash)
+        if entry is None or entry["column"] != column:
+            return {}
+
+        return {
+            connection: decode_watermark(value)
+            for connection, value in entry["connections"].items()
+        }
+
+    def set(
+        self: "WatermarkStore",
+        run_hash: str,
+        column: str,
+        watermarks: dict[str, Any],
+    ):
+        """
+        Replaces the watermarks of a run.
+
+        Args:
+            run_hash: The cache key of the run.
+            column: The watermark column.
+            watermarks: A mapping of connection name to its new watermark.
+        """
+        self._changed.add((run_hash,))
+        self._data[run_hash] = {
+            "column": column,
+            "connections": {
+                connection: encode_watermark(value)
+                for connection, value in watermarks.items()
+                if value is not None
+            },
+        }
+
+    def clear(self: "WatermarkStore", run_hash: str):
+        """
+        Forgets the watermarks of a run, so the next run is a full extraction.
+        """
+        self._changed.add((run_hash,))
+        self._data.pop(run_hash, None)
+
+    def save(self: "WatermarkStore"):
+        """
+        Writes the runs this store changed to disk, keeping what other stores
+        saved for the rest.
+        """
+        with state_lock(self.path):
+            self._data = save_state(self.path, self._data, self._changed)
+            self._changed.clear()
+
+    def high_water_mark(
+        self: "WatermarkStore", df: pd.DataFrame, column: str
+    ) -> Optional[Any]:
+        """
+        Returns the largest non-null value of the watermark column, if any.
+        """
+        if column not in df.columns:
+            raise ValueError(f"Watermark column '{column}' not found in the result!")
+
+        value = df[column].max()
+        return None if pd.isna(value) else value
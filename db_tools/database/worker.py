@@ -0,0 +1,112 @@
+"""
+Query workers for the process-pool execution mode.
+
+Functions in this module run in child processes, so they must stay at module
+level and only receive picklable arguments. Each worker opens its own engine
+from the connection string, decodes the result there and hands it back to the
+parent as an Arrow IPC stream in shared memory, so row decoding no longer
+contends for the parent's GIL and the DataFrame is never pickled.
+"""
+
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Optional
+
+import pandas as pd
+import pyarrow as pa
+from sqlalchemy.engine.create import create_engine
+from sqlalchemy.pool import NullPool
+from sqlalchemy.sql._elements_constructors import text
+
+from .health import is_connectivity_error
+from .profiles import POOL_OPTIONS, engine_options, install_profile
+
+
+def fetch_to_shared_memory(
+    connstring: str,
+    query: str,
+    params: Optional[dict[str, Any]] = None,
+    db_type: Optional[str] = None,
+    profile: Optional[dict[str, Any]] = None,
+) -> dict[str, Any]:
+    """
+    Runs a DQL query and writes the result to a shared memory block.
+
+    Args:
+        connstring: The SQLAlchemy connection string.
+        query: The query to execute.
+        params: Bound parameters of the query, if any.
+        db_type: The connection's driver type, needed to apply `profile`.
+        profile: The connection's performance profile, if any. Pool options
+            are ignored, as workers never pool connections.
+
+    Returns:
+        A dictionary with the shared memory block name and payload size, or
+        the error message if the query failed.
+    """
+    options = {}
+    if db_type is not None and profile:
+        options = engine_options(db_type, profile)
+        for key in POOL_OPTIONS:
+            if key != "isolation_level":
+                options.pop(key, None)
+    engine = create_engine(connstring, poolclass=NullPool, **options)
+    if db_type is not None and profile:
+        install_profile(engine, db_type, profile)
+    try:
+        with engine.connect() as conn:
+            df = pd.read_sql(text(query), conn, params=params)
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        payload = sink.getvalue()
+
+        block = shared_memory.SharedMemory(create=True, size=max(payload.size, 1))
+        try:
+            # Arrow buffers export a signed byte format, while the block is
+            # unsigned bytes, so the view is cast before the copy.
+            block.buf[: payload.size] = memoryview(payload).cast("B")
+        except Exception:
+            block.close()
+            block.unlink()
+            raise
+        name = block.name
+        block.close()
+        # The parent unlinks the block, so this process's resource tracker
+        # must not try to clean it up (or warn about a leak) on exit.
+        resource_tracker.unregister(block._name, "shared_memory")
+
+        return {"success": True, "shm": name, "size": payload.size}
+    except Exception as e:
+        # Driver exceptions are not always picklable, so only the message
+        # crosses the process boundary.
+        return {
+            "success": False,
+            "error": f"{type(e).__name__}: {e}",
+            "connectivity": is_connectivity_error(e),
+        }
+    finally:
+        engine.dispose()
+
+
+def read_from_shared_memory(name: str, size: int) -> pd.DataFrame:
+    """
+    Reads a result written by `fetch_to_shared_memory` and releases the block.
+
+    Args:
+        name: The shared memory block name.
+        size: The size of the Arrow IPC payload.
+
+    Returns:
+        The decoded DataFrame.
+    """
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        # Copy the payload out so no Arrow buffer outlives the mapping.
+        payload = pa.py_buffer(bytes(block.buf[:size]))
+    finally:
+        block.close()
+        block.unlink()
+
+    return pa.ipc.open_stream(payload).read_all().to_pandas()
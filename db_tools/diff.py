@@ -0,0 +1,139 @@
+from typing import Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+CHANGE_COLUMN = "change"
+
+
+def _to_arrow(df: pd.DataFrame) -> pa.Table:
+    """
+    Converts a result to Arrow, decoding dictionary columns so they can be
+    used as join keys.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(
+                i, field.name, pc.cast(table[i], field.type.value_type)
+            )
+    return table
+
+
+def _check_unique(table: pa.Table, keys: list[str], side: str):
+    counts = table.group_by(keys).aggregate([([], "count_all")])
+    if len(counts) != len(table):
+        raise ValueError(
+            f"Diff keys {keys} are not unique in the {side} result! "
+            "Add columns to --diff-keys until they identify a single row."
+        )
+
+
+def _differs(left: pa.ChunkedArray, right: pa.ChunkedArray) -> pa.ChunkedArray:
+    """
+    Null-aware inequality: two NULLs are equal, a NULL and a value are not.
+    """
+    if left.type != right.type:
+        try:
+            right = pc.cast(right, left.type)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            left = pc.cast(left, pa.string())
+            right = pc.cast(right, pa.string())
+
+    not_equal = pc.fill_null(pc.not_equal(left, right), False)
+    null_mismatch = pc.xor(pc.is_null(left), pc.is_null(right))
+
+    return pc.or_(not_equal, null_mismatch)
+
+
+def diff_results(
+    left: pd.DataFrame,
+    right: pd.DataFrame,
+    keys: list[str],
+    connection_column: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Computes row-level differences between two results.
+
+    Rows are matched on `keys` (plus the connection column when both sides
+    have it, so differences are reported per connection) with an Arrow hash
+    join, and only the differing rows are converted back to pandas.
+
+    Args:
+        left: The baseline result.
+        right: The result compared against the baseline.
+        keys: The columns that identify a row.
+        connection_column: The connection tag column, if any.
+
+    Returns:
+        A DataFrame with a `change` column (added, removed or changed), the
+        key columns and `<column>_left` / `<column>_right` for every other
+        column present on both sides.
+    """
+    keys = list(keys)
+    if (
+        connection_column
+        and connection_column in left.columns
+        and connection_column in right.columns
+        and connection_column not in keys
+    ):
+        keys = [connection_column] + keys
+
+    for side, df in [("left", left), ("right", right)]:
+        missing = [key for key in keys if key not in df.columns]
+        if missing:
+            raise ValueError(f"Diff keys {missing} not found in the {side} result!")
+
+    left_table = _to_arrow(left)
+    right_table = _to_arrow(right)
+    _check_unique(left_table, keys, "left")
+    _check_unique(right_table, keys, "right")
+
+    values = [c for c in left.columns if c in right.columns and c not in keys]
+    ignored = set(left.columns).symmetric_difference(right.columns)
+    if ignored:
+        logger.warning(f"Columns present on only one side are not compared: {ignored}")
+
+    left_table = left_table.select(keys + values).append_column(
+        "__left", pa.repeat(True, len(left_table))
+    )
+    right_table = right_table.select(keys + values).append_column(
+        "__right", pa.repeat(True, len(right_table))
+    )
+    joined = left_table.join(
+        right_table,
+        keys=keys,
+        join_type="full outer",
+        left_suffix="_left",
+        right_suffix="_right",
+        coalesce_keys=True,
+    )
+
+    in_left = pc.is_valid(joined["__left"])
+    in_right = pc.is_valid(joined["__right"])
+    changed = pa.repeat(False, len(joined))
+    for column in values:
+        changed = pc.or_(
+            changed, _differs(joined[f"{column}_left"], joined[f"{column}_right"])
+        )
+
+    change = pc.if_else(
+        pc.invert(in_left),
+        "added",
+        pc.if_else(
+            pc.invert(in_right), "removed", pc.if_else(changed, "changed", None)
+        ),
+    )
+    joined = joined.append_column(CHANGE_COLUMN, change).filter(pc.is_valid(change))
+
+    columns = [CHANGE_COLUMN] + keys
+    for column in values:
+        columns += [f"{column}_left", f"{column}_right"]
+
+    joined = joined.select(columns).sort_by([(key, "ascending") for key in keys])
+    return joined.to_pandas()
@@ -1,17 +1,24 @@
 import re
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Union
 
 import pandas as pd
 from openpyxl.utils.cell import get_column_letter
 from openpyxl.workbook.workbook import Workbook
 from openpyxl.worksheet.table import Table, TableStyleInfo
 
+from .database.spill import SpilledResult
+from .logger import get_logger
+from .profiling import profiled, stage
+
+logger = get_logger(__name__)
+
 # TODO Handle Excel max row and column size
 XL_MAX_ROWS: int = 1_048_575
 XL_MAX_COLS: int = 16_384
 
 
+@profiled("format_excel")
 def format_excel(wb: Workbook, df: pd.DataFrame):
     datetime_columns = [
         i
@@ -56,9 +63,30 @@ def format_excel(wb: Workbook, df: pd.DataFrame):
                     cell.number_format = "dd/mm/yyyy"
 
 
+def normalize_types(df: pd.DataFrame) -> pd.DataFrame:
+    # Results unified by the runner are already typed, so only leftover
+    # object columns need inference.
+    object_columns = df.select_dtypes(include="object").columns
+    if len(object_columns):
+        df = df.copy()
+        with stage("infer_objects"):
+            df[object_columns] = df[object_columns].infer_objects()
+
+    tz_columns = [
+        column
+        for column, dtype in df.dtypes.items()
+        if isinstance(dtype, pd.DatetimeTZDtype)
+    ]
+
+    for column in tz_columns:
+        df[column] = df[column].dt.tz_convert(None)
+
+    return df
+
+
 def export_data(
     save_path: Path,
-    df: pd.DataFrame,
+    df: Union[pd.DataFrame, SpilledResult],
     file_format: str,
     single_file: bool,
     single_sheet: bool,
@@ -72,41 +100,53 @@ def export_data(
     if connection_column and connection_column not in df.columns:
         raise ValueError(f"{connection_column} not found in Dataframe!")
 
-    df = df.infer_objects()
-
-    datetime_columns = [
-        i
-        for i, dtype in enumerate(df.dtypes)
-        if pd.api.types.is_datetime64_any_dtype(dtype)
-    ]
+    if isinstance(df, SpilledResult):
+        if file_format == "csv":
+            # Spilled results are streamed batch by batch.
+            for i, batch in enumerate(df.iter_batches()):
+                normalize_types(batch).to_csv(
+                    save_path, mode="w" if i == 0 else "a", header=i == 0, index=False
+                )
+            return
+
+        logger.warning(
+            f"Exporting {file_format} loads the whole spilled result into memory"
+        )
+        df = df.to_pandas()
 
-    for i in datetime_columns:
-        df[df.columns[i]] = df[df.columns[i]].dt.tz_convert(None)
+    df = normalize_types(df)
 
     if file_format == "xlsx":
         if single_file and single_sheet:
             with pd.ExcelWriter(save_path, engine="openpyxl") as writer:
-                df.to_excel(writer, sheet_name="Data", index=False)
+                with stage("to_excel"):
+                    df.to_excel(writer, sheet_name="Data", index=False)
                 format_excel(writer.book, df)
 
         elif single_file:
             with pd.ExcelWriter(save_path, engine="openpyxl") as writer:
-                for connection in df[connection_column].unique():
-                    conn_df = df[df[connection_column] == connection]
+                for connection, conn_df in df.groupby(
+                    connection_column, observed=True, sort=False
+                ):
                     conn_df = conn_df.drop(columns=[connection_column])
-                    conn_df.to_excel(writer, sheet_name=connection, index=False)
+                    with stage("to_excel"):
+                        conn_df.to_excel(writer, sheet_name=connection, index=False)
                 format_excel(writer.book, df)
 
         elif single_sheet:
-            for connection in df[connection_column].unique():
+            for connection, conn_df in df.groupby(
+                connection_column, observed=True, sort=False
+            ):
                 file_path = save_path.with_stem(f"{save_path.stem}_{connection}")
                 with pd.ExcelWriter(file_path, engine="openpyxl") as writer:
-                    conn_df = df[df[connection_column] == connection]
                     conn_df = conn_df.drop(columns=[connection_column])
-                    conn_df.to_excel(writer, index=False)
+                    with stage("to_excel"):
+                        conn_df.to_excel(writer, index=False)
                     format_excel(writer.book, df)
 
     elif file_format == "json":
-        df.to_json(save_path, orient="records", indent=4)
+        with stage("to_json"):
+            df.to_json(save_path, orient="records", indent=4)
     elif file_format == "csv":
-        df.to_csv(save_path, index=False)
+        with stage("to_csv"):
+            df.to_csv(save_path, index=False)
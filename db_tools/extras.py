@@ -46,6 +46,13 @@ def find_root_dir(markers: list[str]) -> Path:
             raise FileNotFoundError(f"No marker found!\nMarkers: {markers_str}")
 
 
+def load_config() -> "Struct":
+    """Return the main configuration from config/config.toml."""
+    root = find_root_dir(["pyproject.toml"])
+    with open(root / "config/config.toml", "rb") as f:
+        return Struct(tomllib.load(f))
+
+
 def get_available_connections() -> list[str]:
     """Return a list of available connection names from TOML files."""
     root = find_root_dir(["pyproject.toml"])
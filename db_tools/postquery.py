@@ -0,0 +1,50 @@
+import sqlite3
+from contextlib import closing
+from typing import Union
+
+import pandas as pd
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+from .database.spill import SpilledResult
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def run_post_query(
+    df: Union[pd.DataFrame, SpilledResult], query: str, table_name: str = "results"
+) -> pd.DataFrame:
+    """
+    Runs a SQL query over an already fetched result, in-process.
+
+    The result is exposed as a table named `table_name`. DuckDB is used when
+    it is installed, since it queries the DataFrame in place; otherwise the
+    result is loaded into an in-memory SQLite database. Spilled results are
+    streamed into DuckDB as Arrow batches.
+
+    Args:
+        df: The combined result of a run.
+        query: The post-query to execute.
+        table_name: The table name the result is exposed as.
+
+    Returns:
+        The post-query's result.
+    """
+    if duckdb is not None:
+        if isinstance(df, SpilledResult):
+            df = df.to_arrow_reader()
+        with duckdb.connect() as conn:
+            conn.register(table_name, df)
+            return conn.execute(query).df()
+
+    if isinstance(df, SpilledResult):
+        df = df.to_pandas()
+
+    logger.info("DuckDB not installed, running post-query on in-memory SQLite")
+    with closing(sqlite3.connect(":memory:")) as conn:
+        df.to_sql(table_name, conn, index=False)
+        return pd.read_sql(query, conn)
@@ -0,0 +1,266 @@
+import cProfile
+import functools
+import json
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, ContextManager, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine.base import Engine
+
+from .logger import get_logger
+
+PROFILE_EXTRAS = ["memory", "cprofile"]
+
+_active: Optional["RunProfiler"] = None
+
+
+class RunProfiler:
+    """
+    Times the stages of a run and writes a profile artifact for it.
+
+    Stages are timed wherever the pipeline calls `stage()` while a profiler is
+    active; concurrent stages in worker threads add up, so a stage's total can
+    exceed the run's wall time. With `memory`, tracemalloc records each
+    stage's net allocation and the run's top allocation sites. With
+    `cprofile`, every profiled thread gets its own profiler and the merged
+    statistics are dumped next to the artifact as a `.pstats` file.
+    """
+
+    root: Path
+    memory: bool
+    cprofile: bool
+    metadata: dict[str, Any]
+
+    def __init__(
+        self: "RunProfiler",
+        root: Path,
+        memory: bool = False,
+        cprofile: bool = False,
+        **metadata,
+    ):
+        """
+        Initializes a new RunProfiler object.
+
+        Args:
+            root: The directory profile artifacts are written to.
+            memory: Whether to trace allocations with tracemalloc.
+            cprofile: Whether to collect cProfile statistics.
+            **metadata: Run details stored in the artifact (query, environment...).
+        """
+        self.logger = get_logger(__name__)
+        self.root = Path(root)
+        self.memory = memory
+        self.cprofile = cprofile
+        self.metadata = metadata
+        self._lock = threading.Lock()
+        self._stages: dict[str, dict[str, float]] = {}
+        self._profiles: list[cProfile.Profile] = []
+        self._local = threading.local()
+        self._started: Optional[float] = None
+        self.duration: Optional[float] = None
+        self._started_at: Optional[datetime] = None
+
+    def record(
+        self: "RunProfiler", name: str, elapsed: float, allocated: Optional[int] = None
+    ):
+        """
+        Adds one timing to a stage.
+        """
+        with self._lock:
+            entry = self._stages.setdefault(
+                name, {"calls": 0, "total": 0.0, "max": 0.0, "allocated": 0}
+            )
+            entry["calls"] += 1
+            entry["total"] += elapsed
+            entry["max"] = max(entry["max"], elapsed)
+            if allocated is not None:
+                entry["allocated"] += allocated
+
+    @contextmanager
+    def stage(self: "RunProfiler", name: str) -> Iterator[None]:
+        """
+        Times the enclosed block as one call of a stage.
+        """
+        memory = self.memory and tracemalloc.is_tracing()
+        before = tracemalloc.get_traced_memory()[0] if memory else None
+        start = time.perf_counter()
+        try:
+            with self.thread():
+                yield
+        finally:
+            elapsed = time.perf_counter() - start
+            allocated = tracemalloc.get_traced_memory()[0] - before if memory else None
+            self.record(name, elapsed, allocated)
+
+    @contextmanager
+    def thread(self: "RunProfiler") -> Iterator[None]:
+        """
+        Collects cProfile statistics for the current thread while the block
+        runs, unless they are already being collected.
+        """
+        if not self.cprofile or getattr(self._local, "profile", None) is not None:
+            yield
+            return
+
+        profile = cProfile.Profile()
+        self._local.profile = profile
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._local.profile = None
+            with self._lock:
+                self._profiles.append(profile)
+
+    def start(self: "RunProfiler"):
+        """
+        Activates the profiler for the pipeline.
+        """
+        global _active
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._started = time.perf_counter()
+        self._started_at = datetime.now()
+        _active = self
+
+    def stop(self: "RunProfiler") -> Path:
+        """
+        Deactivates the profiler and writes the run's artifact.
+
+        Returns:
+            The path of the JSON artifact.
+        """
+        global _active
+        if _active is self:
+            _active = None
+
+        duration = self.duration = time.perf_counter() - self._started
+        self.root.mkdir(parents=True, exist_ok=True)
+        stem = self._started_at.strftime("%Y%m%d_%H%M%S_%f")
+        path = self.root / f"{stem}.json"
+
+        artifact: dict[str, Any] = {
+            "started_at": self._started_at.isoformat(),
+            "duration": duration,
+            **self.metadata,
+            "stages": self.breakdown(duration),
+        }
+
+        if self.memory and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            artifact["memory"] = {
+                "current": current,
+                "peak": peak,
+                "top": [
+                    {"location": str(stat.traceback), "size": stat.size}
+                    for stat in snapshot.statistics("lineno")[:25]
+                ],
+            }
+
+        if self._profiles:
+            stats = pstats.Stats(*self._profiles)
+            pstats_path = self.root / f"{stem}.pstats"
+            stats.dump_stats(pstats_path)
+            artifact["cprofile"] = pstats_path.name
+
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(artifact, f, indent=2, default=str)
+
+        self.logger.info(f"Profile written to {path}")
+
+        return path
+
+    def breakdown(
+        self: "RunProfiler", duration: Optional[float] = None
+    ) -> list[dict[str, Any]]:
+        """
+        Returns the stage timings, slowest first.
+
+        Args:
+            duration: The run's wall time, to add each stage's share of it.
+        """
+        with self._lock:
+            stages = [
+                {
+                    "stage": name,
+                    "calls": int(entry["calls"]),
+                    "total": entry["total"],
+                    "mean": entry["total"] / entry["calls"],
+                    "max": entry["max"],
+                    **({"allocated": int(entry["allocated"])} if self.memory else {}),
+                    **({"share": entry["total"] / duration} if duration else {}),
+                }
+                for name, entry in self._stages.items()
+            ]
+
+        return sorted(stages, key=lambda stage: stage["total"], reverse=True)
+
+    def summary(self: "RunProfiler") -> str:
+        """
+        Returns the stage breakdown as a text table.
+        """
+        lines = [
+            f"{'stage':<20}{'calls':>8}{'total (s)':>12}{'max (s)':>10}{'share':>8}"
+        ]
+        for entry in self.breakdown(self.duration):
+            share = f"{entry['share']:.0%}" if "share" in entry else ""
+            lines.append(
+                f"{entry['stage']:<20}{entry['calls']:>8}{entry['total']:>12.3f}"
+                f"{entry['max']:>10.3f}{share:>8}"
+            )
+        if self.duration is not None:
+            lines.append(f"{'wall time':<20}{'':>8}{self.duration:>12.3f}")
+
+        return "\n".join(lines)
+
+
+def stage(name: str) -> ContextManager:
+    """
+    Times a pipeline stage on the active profiler, if there is one.
+    """
+    if _active is None:
+        return nullcontext()
+    return _active.stage(name)
+
+
+def profiled(name: str) -> Callable:
+    """
+    Decorates a function so each call is timed as a stage.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def install_profiling_hooks(engine: Engine):
+    """
+    Times each statement's execution on the database, apart from the fetch
+    and decoding that follow it.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_execute(conn, cursor, statement, parameters, context, executemany):
+        if _active is not None:
+            conn.info["_profile_start"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _end_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info.pop("_profile_start", None)
+        if start is not None and _active is not None:
+            _active.record("db_execute", time.perf_counter() - start)
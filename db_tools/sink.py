@@ -0,0 +1,183 @@
+import csv
+import os
+import tempfile
+from typing import Iterator, Union
+
+import pandas as pd
+from sqlalchemy.engine.base import Engine
+from sqlalchemy.engine.create import create_engine
+from sqlalchemy.sql._elements_constructors import text
+
+from .database.spill import SpilledResult
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def _rows(df: pd.DataFrame, chunksize: int) -> Iterator[tuple]:
+    """
+    Yields the rows of a frame as tuples with NULLs as None, one chunk at a
+    time so the whole frame is never converted to objects at once.
+    """
+    for start in range(0, len(df), chunksize):
+        chunk = df.iloc[start : start + chunksize].astype(object)
+        chunk = chunk.where(chunk.notna(), None)
+        yield from chunk.itertuples(index=False, name=None)
+
+
+def _copy_postgresql(engine: Engine, df: pd.DataFrame, table: str, chunksize: int):
+    preparer = engine.dialect.identifier_preparer
+    columns = ", ".join(preparer.quote(str(column)) for column in df.columns)
+    statement = f"COPY {preparer.quote(table)} ({columns}) FROM STDIN"
+
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cursor:
+            with cursor.copy(statement) as copy:
+                for row in _rows(df, chunksize):
+                    copy.write_row(row)
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def _escape_mysql(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Doubles the backslashes in string values, which LOAD DATA reads as its
+    escape character, so they load as written and a literal "\\N" string is
+    not taken for NULL.
+    """
+    df = df.copy(deep=False)
+    for column in df.columns:
+        if df[column].dtype == object or pd.api.types.is_string_dtype(df[column]):
+            df[column] = df[column].map(
+                lambda v: v.replace("\\", "\\\\") if isinstance(v, str) else v
+            )
+
+    return df
+
+
+def _load_data_mysql(engine: Engine, df: pd.DataFrame, table: str):
+    preparer = engine.dialect.identifier_preparer
+    columns = ", ".join(preparer.quote(str(column)) for column in df.columns)
+
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    try:
+        _escape_mysql(df).to_csv(
+            path,
+            index=False,
+            header=False,
+            na_rep="\\N",
+            quoting=csv.QUOTE_MINIMAL,
+            lineterminator="\n",
+        )
+        infile_engine = create_engine(engine.url, connect_args={"local_infile": True})
+        try:
+            with infile_engine.begin() as conn:
+                conn.execute(
+                    text(
+                        f"LOAD DATA LOCAL INFILE :path INTO TABLE {preparer.quote(table)} "
+                        "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' "
+                        "ESCAPED BY '\\\\' "
+                        f"LINES TERMINATED BY '\\n' ({columns})"
+                    ),
+                    {"path": path},
+                )
+        finally:
+            infile_engine.dispose()
+    finally:
+        os.remove(path)
+
+
+def _executemany_sqlite(engine: Engine, df: pd.DataFrame, table: str, chunksize: int):
+    preparer = engine.dialect.identifier_preparer
+    columns = ", ".join(preparer.quote(str(column)) for column in df.columns)
+    placeholders = ", ".join("?" for _ in df.columns)
+    statement = (
+        f"INSERT INTO {preparer.quote(table)} ({columns}) VALUES ({placeholders})"
+    )
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        rows = _rows(df, chunksize)
+        while batch := [row for _, row in zip(range(chunksize), rows)]:
+            cursor.executemany(statement, batch)
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+
+def sink_to_connection(
+    engine: Engine,
+    db_type: str,
+    df: Union[pd.DataFrame, SpilledResult],
+    table: str,
+    if_exists: str = "append",
+    chunksize: int = 10_000,
+) -> int:
+    """
+    Writes a result into a table on a configured connection.
+
+    The table is created from the frame's dtypes when it does not exist, then
+    rows are loaded with the fastest native path of the driver: COPY FROM
+    STDIN on PostgreSQL, LOAD DATA LOCAL INFILE on MySQL and a single
+    executemany transaction on SQLite. Other drivers fall back to batched
+    inserts. Spilled results are loaded one batch at a time.
+
+    Args:
+        engine: The target connection's engine.
+        db_type: The target connection's driver type.
+        df: The rows to write.
+        table: The target table name.
+        if_exists: What to do if the table exists: append, replace or fail.
+        chunksize: How many rows to convert or insert per batch.
+
+    Returns:
+        The number of rows written.
+    """
+    if if_exists not in ["append", "replace", "fail"]:
+        raise ValueError(f"Invalid if_exists '{if_exists}'!")
+
+    if isinstance(df, SpilledResult):
+        written = 0
+        for i, batch in enumerate(df.iter_batches()):
+            written += sink_to_connection(
+                engine,
+                db_type,
+                batch,
+                table,
+                if_exists if i == 0 else "append",
+                chunksize,
+            )
+        return written
+
+    # Categoricals are written as their values, which every driver accepts.
+    df = df.astype(
+        {
+            column: dtype.categories.dtype
+            for column, dtype in df.dtypes.items()
+            if isinstance(dtype, pd.CategoricalDtype)
+        }
+    )
+
+    df.head(0).to_sql(table, engine, if_exists=if_exists, index=False)
+    logger.info(f"Loading {len(df)} rows into {table} ({db_type})")
+
+    if df.empty:
+        return 0
+
+    if db_type == "postgresql":
+        _copy_postgresql(engine, df, table, chunksize)
+    elif db_type == "mysql":
+        _load_data_mysql(engine, df, table)
+    elif db_type == "sqlite":
+        _executemany_sqlite(engine, df, table, chunksize)
+    else:
+        df.to_sql(table, engine, if_exists="append", index=False, chunksize=chunksize)
+
+    return len(df)
@@ -12,6 +12,8 @@ from db_tools.database.runner import DBConnectionRunner
 from db_tools.exporter import export_data
 from db_tools.extras import Struct, find_root_dir, get_available_connections
 from db_tools.gui.connections import ConnectionsWindow
+from db_tools.postquery import run_post_query
+from db_tools.profiling import RunProfiler
 
 
 class CustomMessageBox(customtkinter.CTkToplevel):
@@ -97,6 +99,7 @@ class App(customtkinter.CTk):
 
         self.geometry(f"{window_width}x{window_height}+{center_x}+{center_y}")
         self.results_df = None
+        self.fetched_df = None
         self.connections_window = None
 
         # --- Main Layout ---
@@ -325,6 +328,31 @@ class App(customtkinter.CTk):
             row=7, column=1, padx=(0, 10), pady=5, sticky="ew"
         )
 
+        # Preview
+        self.preview_rows_label = customtkinter.CTkLabel(
+            self.options_frame, text=f"{self.locale_config.labels.preview_rows}:"
+        )
+        self.preview_rows_label.grid(row=8, column=0, padx=(0, 5), pady=5, sticky="w")
+
+        self.preview_rows_var = customtkinter.StringVar(value="100")
+        self.preview_rows_entry = customtkinter.CTkEntry(
+            self.options_frame, textvariable=self.preview_rows_var
+        )
+        self.preview_rows_entry.grid(row=8, column=1, padx=(0, 10), pady=5, sticky="ew")
+
+        # Profiling
+        self.profile_var = customtkinter.StringVar(value="off")
+        self.profile_checkbox = customtkinter.CTkCheckBox(
+            self.options_frame,
+            text=self.locale_config.labels.profile_run,
+            variable=self.profile_var,
+            onvalue="on",
+            offvalue="off",
+        )
+        self.profile_checkbox.grid(
+            row=9, column=0, columnspan=2, padx=(0, 10), pady=5, sticky="w"
+        )
+
         # --- Commit Checkbox & Run Button ---
         self.bottom_frame = customtkinter.CTkFrame(
             self.left_frame, corner_radius=0, fg_color="transparent"
@@ -356,7 +384,14 @@ class App(customtkinter.CTk):
             text=self.locale_config.labels.run_query,
             command=self._run_query_callback,
         )
-        self.run_button.grid(row=0, column=2, padx=(10, 0), pady=10, sticky="e")
+        self.run_button.grid(row=0, column=3, padx=(10, 0), pady=10, sticky="e")
+
+        self.preview_button = customtkinter.CTkButton(
+            self.bottom_frame,
+            text=self.locale_config.labels.preview,
+            command=self._preview_query_callback,
+        )
+        self.preview_button.grid(row=0, column=2, padx=(10, 0), pady=10, sticky="e")
 
         # --- Right Panel (Query and Results) ---
         self.right_frame = customtkinter.CTkFrame(self)
@@ -364,12 +399,46 @@ class App(customtkinter.CTk):
         self.right_frame.grid_rowconfigure(1, weight=1)  # Make results table expandable
         self.right_frame.grid_columnconfigure(0, weight=1)
 
+        self.query_tabs = customtkinter.CTkTabview(self.right_frame, height=200)
+        self.query_tabs.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
+        self.query_tab = self.query_tabs.add(self.locale_config.labels.query)
+        self.post_query_tab = self.query_tabs.add(self.locale_config.labels.post_query)
+
+        self.query_tab.grid_rowconfigure(0, weight=1)
+        self.query_tab.grid_columnconfigure(0, weight=1)
         self.query_box = customtkinter.CTkTextbox(
-            self.right_frame, height=150, border_width=2, font=("Consolas", 12)
+            self.query_tab, height=150, border_width=2, font=("Consolas", 12)
         )
-        self.query_box.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
+        self.query_box.grid(row=0, column=0, sticky="nsew")
         self.query_box.insert("1.0", self.locale_config.placeholders.query_input)
 
+        # --- Post-query over the fetched results ---
+        self.post_query_tab.grid_rowconfigure(0, weight=1)
+        self.post_query_tab.grid_columnconfigure(0, weight=1)
+        self.post_query_box = customtkinter.CTkTextbox(
+            self.post_query_tab, height=120, border_width=2, font=("Consolas", 12)
+        )
+        self.post_query_box.grid(row=0, column=0, columnspan=2, sticky="nsew")
+        self.post_query_box.insert(
+            "1.0", self.locale_config.placeholders.post_query_input
+        )
+
+        self.post_query_button = customtkinter.CTkButton(
+            self.post_query_tab,
+            text=self.locale_config.labels.run_post_query,
+            command=self._run_post_query_callback,
+            state="disabled",
+        )
+        self.post_query_button.grid(row=1, column=1, pady=(5, 0), sticky="e")
+
+        self.reset_results_button = customtkinter.CTkButton(
+            self.post_query_tab,
+            text=self.locale_config.labels.reset_results,
+            command=self._reset_results_callback,
+            state="disabled",
+        )
+        self.reset_results_button.grid(row=1, column=0, pady=(5, 0), sticky="w")
+
         self._create_results_table()
 
         self.save_button = customtkinter.CTkButton(
@@ -486,7 +555,21 @@ class App(customtkinter.CTk):
         for var in self.conn_checkboxes.values():
             var.set(new_state)
 
-    def _run_query_callback(self: "App"):
+    def _preview_query_callback(self: "App"):
+        try:
+            preview_rows = int(self.preview_rows_var.get())
+        except ValueError:
+            preview_rows = 0
+        if preview_rows < 1:
+            messagebox.showwarning(
+                self.locale_config.labels.preview,
+                self.locale_config.messages.invalid_preview_rows,
+            )
+            return
+
+        self._run_query_callback(preview_rows)
+
+    def _run_query_callback(self: "App", preview_rows=None):
         selected_connections = [
             name for name, var in self.conn_checkboxes.items() if var.get() == "on"
         ]
@@ -518,6 +601,12 @@ class App(customtkinter.CTk):
             messagebox.showerror("Invalid Query", str(e))
             return
 
+        if preview_rows is not None and query_type != QueryType.DQL:
+            messagebox.showerror(
+                "Invalid Query", self.locale_config.messages.preview_select_only
+            )
+            return
+
         if commit_mode and query_type != QueryType.DQL:
             if not self._ask_yes_no_custom(
                 self.locale_config.confirmation.title1,
@@ -538,8 +627,12 @@ class App(customtkinter.CTk):
         self.run_button.configure(
             state="disabled", text=f"{self.locale_config.labels.running}..."
         )
+        self.preview_button.configure(state="disabled")
         self.save_button.configure(state="disabled")
+        self.post_query_button.configure(state="disabled")
+        self.reset_results_button.configure(state="disabled")
         self.results_df = None
+        self.fetched_df = None
 
         # Clear previous results
         for item in self.results_table.get_children():
@@ -549,35 +642,67 @@ class App(customtkinter.CTk):
         # Run the database query in a background thread
         thread = threading.Thread(
             target=self._execute_query_worker,
-            args=(selected_connections, query, commit_mode),
+            args=(selected_connections, query, commit_mode, preview_rows),
         )
         thread.daemon = True
         thread.start()
 
-    def _execute_query_worker(self: "App", connections, query, commit_mode):
+    def _execute_query_worker(
+        self: "App", connections, query, commit_mode, preview_rows=None
+    ):
         """Worker function to be run in a separate thread."""
         try:
-            use_cache_callback = lambda: self._ask_yes_no_custom(
-                self.locale_config.cache.found_title,
-                self.locale_config.cache.found_message,
-            )
             runner = DBConnectionRunner(
                 environment=self.environment_var.get(),
                 connections=connections,
-                max_workers=int(self.max_workers_var.get()),
-            )
-            results_df = runner.execute_query_multi_db(
-                query=query,
-                commit=commit_mode,
-                parallel=self.parallel_var.get() == "on",
-                add_connection_column=True
-                if self.connection_column_var.get()
-                else False,
-                connection_column_name=self.connection_column_var.get(),
-                cache=self.cache_var.get() == "on",
-                ignore_cache=self.ignore_cache_var.get() == "on",
-                use_cache_callback=use_cache_callback,
             )
+            runner.configurations.max_workers = int(self.max_workers_var.get())
+            runner.configurations.parallel = self.parallel_var.get() == "on"
+            runner.configurations.cache = self.cache_var.get() == "on"
+            if self.connection_column_var.get():
+                runner.configurations.column_name = self.connection_column_var.get()
+
+            profiler = None
+            if self.profile_var.get() == "on":
+                profiler = RunProfiler(
+                    Path(
+                        runner.configurations.get("profiling", {}).get(
+                            "path", "profiles"
+                        )
+                    ),
+                    query=query,
+                    environment=runner.environment,
+                    connections=list(runner.connections),
+                )
+                profiler.start()
+
+            try:
+                if preview_rows is not None:
+                    results_df = runner.preview_query_multi_db(
+                        query,
+                        preview_rows,
+                        ignore_cache=self.ignore_cache_var.get() == "on",
+                    )
+                else:
+                    results_df = runner.execute_query_multi_db(
+                        query=query,
+                        commit=commit_mode,
+                        ignore_cache=self.ignore_cache_var.get() == "on",
+                        # The results table needs the whole result in memory.
+                        allow_spill=False,
+                    )
+            finally:
+                runner.close_all()
+                if profiler is not None:
+                    profile_path = profiler.stop()
+                    self.after(
+                        0,
+                        messagebox.showinfo,
+                        self.locale_config.labels.profile_run,
+                        self.locale_config.messages.profile_saved.format(
+                            file_path=profile_path, summary=profiler.summary()
+                        ),
+                    )
             self.after(0, self._update_ui_after_query, results_df)
         except Exception as e:
             self.after(0, self._update_ui_after_query, e)
@@ -587,6 +712,7 @@ class App(customtkinter.CTk):
         self.run_button.configure(
             state="normal", text=self.locale_config.labels.run_query
         )
+        self.preview_button.configure(state="normal")
 
         if isinstance(result, Exception):
             error_msg = self.locale_config.messages.query_error_message.format(
@@ -596,33 +722,78 @@ class App(customtkinter.CTk):
             return
 
         if isinstance(result, pd.DataFrame):
-            self.results_df = result
-            if result.empty:
-                messagebox.showinfo(
-                    self.locale_config.messages.no_results,
-                    self.locale_config.messages.no_results_returned,
-                )
-                return
-
-            self.save_button.configure(state="normal")
-
-            # --- Populate Table ---
-            self.results_table["columns"] = list(result.columns)
-            for col in result.columns:
-                self.results_table.heading(col, text=col)
-                # Simple auto-width - can be improved
-                self.results_table.column(
-                    col, width=len(col) * 10, minwidth=50, stretch=True
-                )
-
-            for index, row in result.iterrows():
-                self.results_table.insert("", "end", values=list(row))
+            self.fetched_df = result
+            self._show_results(result)
         else:
             messagebox.showinfo(
                 self.locale_config.messages.success,
                 self.locale_config.messages.dml_success,
             )
 
+    def _show_results(self: "App", result: pd.DataFrame):
+        """Displays a DataFrame in the results table."""
+        for item in self.results_table.get_children():
+            self.results_table.delete(item)
+        self.results_table["columns"] = []
+
+        self.results_df = result
+        if result.empty:
+            messagebox.showinfo(
+                self.locale_config.messages.no_results,
+                self.locale_config.messages.no_results_returned,
+            )
+            return
+
+        self.save_button.configure(state="normal")
+        self.post_query_button.configure(state="normal")
+
+        # --- Populate Table ---
+        self.results_table["columns"] = list(result.columns)
+        for col in result.columns:
+            self.results_table.heading(col, text=col)
+            # Simple auto-width - can be improved
+            self.results_table.column(
+                col, width=len(col) * 10, minwidth=50, stretch=True
+            )
+
+        for index, row in result.iterrows():
+            self.results_table.insert("", "end", values=list(row))
+
+    def _run_post_query_callback(self: "App"):
+        """Runs the post-query over the fetched results, without re-querying."""
+        if self.fetched_df is None or self.fetched_df.empty:
+            messagebox.showwarning(
+                self.locale_config.messages.no_results,
+                self.locale_config.messages.no_results_save,
+            )
+            return
+
+        post_query = self.post_query_box.get("1.0", "end").strip()
+        if not post_query or post_query.startswith("--"):
+            messagebox.showwarning(
+                self.locale_config.messages.enter_query,
+                self.locale_config.messages.enter_query,
+            )
+            return
+
+        try:
+            result = run_post_query(self.fetched_df, post_query)
+        except Exception as e:
+            error_msg = self.locale_config.messages.query_error_message.format(
+                error=str(e)
+            )
+            messagebox.showerror(self.locale_config.messages.query_error, error_msg)
+            return
+
+        self._show_results(result)
+        self.reset_results_button.configure(state="normal")
+
+    def _reset_results_callback(self: "App"):
+        """Shows the fetched results again, discarding the post-query."""
+        if self.fetched_df is not None:
+            self._show_results(self.fetched_df)
+        self.reset_results_button.configure(state="disabled")
+
     def _save_results(self: "App"):
         if self.results_df is None or self.results_df.empty:
             messagebox.showwarning(
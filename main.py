@@ -1,14 +1,45 @@
 import argparse
+from datetime import datetime
 from pathlib import Path
+from typing import Any
 
-from db_tools.database import DBConnectionRunner
+from db_tools.daemon import DaemonClient, QueryDaemon
+from db_tools.database import DBConnectionManager, DBConnectionRunner
+from db_tools.database.partition import PARTITION_MODES, PartitionPlan
+from db_tools.database.spill import SpilledResult
+from db_tools.diff import diff_results
 from db_tools.exporter import export_data
-from db_tools.extras import get_available_connections
+from db_tools.extras import get_available_connections, load_config
 from db_tools.logger import get_logger, setup_logging
+from db_tools.postquery import run_post_query
+from db_tools.profiling import PROFILE_EXTRAS, RunProfiler, stage
+from db_tools.sink import sink_to_connection
 
 connections = get_available_connections()
 
 
+def bound(value: str) -> Any:
+    """
+    Parses a partition bound as an integer, a number or a date/time.
+    """
+    for parse in (int, float, datetime.fromisoformat):
+        try:
+            return parse(value)
+        except ValueError:
+            continue
+    raise argparse.ArgumentTypeError(f"invalid bound: '{value}'")
+
+
+def routing_key(value: str) -> tuple[str, str]:
+    """
+    Parses a routing key given as NAME=VALUE.
+    """
+    name, sep, key = value.partition("=")
+    if not sep or not name.strip() or not key.strip():
+        raise argparse.ArgumentTypeError(f"invalid routing key: '{value}'")
+    return name.strip(), key.strip()
+
+
 def create_arguments() -> argparse.ArgumentParser:
     """
     Creates and configures the argument parser for the command-line interface.
@@ -30,7 +61,7 @@ def create_arguments() -> argparse.ArgumentParser:
         choices=connections,
         help="Utilizar somente estas conexões. Conexões disponíveis na configuração 'connections'.",
     )
-    parser.add_argument("-q", "--query", type=str, required=True)
+    parser.add_argument("-q", "--query", type=str, required=False)
     parser.add_argument(
         "-s",
         "--save-path",
@@ -55,43 +86,453 @@ def create_arguments() -> argparse.ArgumentParser:
     parser.add_argument(
         "--ignore-cache", action=argparse.BooleanOptionalAction, default=False
     )
+    parser.add_argument(
+        "--group-by",
+        type=str,
+        nargs="+",
+        default=[],
+        help="Colunas de agrupamento para a agregação distribuída.",
+    )
+    parser.add_argument(
+        "--aggregate",
+        type=str,
+        nargs="+",
+        help="Agregações no formato funcao:coluna (sum, count, min, max, avg, count_distinct).",
+    )
+    parser.add_argument(
+        "--order-by",
+        type=str,
+        nargs="+",
+        help="Ordenação global no formato coluna ou coluna:desc. Requer --limit.",
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        help="Retorna somente as N primeiras linhas globais segundo --order-by.",
+    )
+    parser.add_argument(
+        "--post-query",
+        type=str,
+        help="Query SQL executada localmente sobre o resultado, exposto como a tabela 'results'.",
+    )
+    parser.add_argument(
+        "--diff-keys",
+        type=str,
+        nargs="+",
+        help="Compara dois resultados linha a linha usando estas colunas como chave.",
+    )
+    parser.add_argument(
+        "--diff-environment",
+        type=str,
+        choices=["staging", "production", "replica"],
+        help="Ambiente comparado com --environment. Sem ele, compara o cache com uma nova execução.",
+    )
+    parser.add_argument(
+        "--preview",
+        type=int,
+        metavar="N",
+        help="Busca no máximo N linhas de cada conexão e exibe o resultado.",
+    )
+    parser.add_argument(
+        "--preview-sample",
+        type=int,
+        metavar="K",
+        help="Na prévia, consulta somente K conexões escolhidas aleatoriamente.",
+    )
+    parser.add_argument(
+        "--incremental",
+        type=str,
+        metavar="COLUNA",
+        help="Busca somente linhas com COLUNA acima da última marca de cada conexão e as anexa ao resultado em cache.",
+    )
+    parser.add_argument(
+        "--partition-column",
+        type=str,
+        metavar="COLUNA",
+        help="Divide a consulta de cada conexão em partições de COLUNA executadas em paralelo.",
+    )
+    parser.add_argument(
+        "--partitions",
+        type=int,
+        default=4,
+        help="Número de partições por conexão (padrão: 4).",
+    )
+    parser.add_argument(
+        "--partition-mode",
+        type=str,
+        default="range",
+        choices=PARTITION_MODES,
+    )
+    parser.add_argument("--lower-bound", type=bound)
+    parser.add_argument("--upper-bound", type=bound)
+    parser.add_argument(
+        "--routing-key",
+        type=routing_key,
+        metavar="INDICE=VALOR",
+        help="Consulta somente as conexões que o índice de roteamento INDICE associa a VALOR.",
+    )
+    parser.add_argument(
+        "--refresh-index",
+        type=str,
+        metavar="INDICE",
+        help="Reconstrói o índice de roteamento INDICE em todas as conexões.",
+    )
+    parser.add_argument(
+        "--sink-connection",
+        type=str,
+        choices=connections,
+        help="Grava o resultado em uma tabela desta conexão.",
+    )
+    parser.add_argument("--sink-table", type=str)
+    parser.add_argument(
+        "--sink-if-exists",
+        type=str,
+        default="append",
+        choices=["append", "replace", "fail"],
+    )
+    parser.add_argument(
+        "--coordinated",
+        action="store_true",
+        help="Executa a DML em todas as conexões e só comita se todas tiverem sucesso. Sem --commit, apenas reporta as linhas afetadas.",
+    )
+    parser.add_argument(
+        "--min-rows",
+        type=int,
+        help="Com --coordinated, mínimo de linhas afetadas por conexão.",
+    )
+    parser.add_argument(
+        "--max-rows",
+        type=int,
+        help="Com --coordinated, máximo de linhas afetadas por conexão.",
+    )
+    parser.add_argument(
+        "--schema-report",
+        action="store_true",
+        help="Compara o schema de todas as conexões e reporta divergências.",
+    )
+    parser.add_argument(
+        "--refresh-schema",
+        action="store_true",
+        help="Ignora os schemas em cache ao gerar o relatório.",
+    )
+    parser.add_argument(
+        "--probe",
+        action="store_true",
+        help="Testa todas as conexões com 'SELECT 1' e atualiza o registro de saúde.",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="*",
+        choices=PROFILE_EXTRAS,
+        metavar="EXTRA",
+        help="Mede o tempo de cada etapa da execução e grava um perfil em [profiling].path. "
+        "Extras: memory (tracemalloc) e cprofile (arquivo .pstats).",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Inicia o daemon que mantém as conexões abertas entre execuções.",
+    )
+    parser.add_argument("--daemon-port", type=int, default=8765)
+    parser.add_argument(
+        "--use-daemon",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Envia a query ao daemon quando houver um em execução.",
+    )
 
     return parser
 
 
+def save_results(
+    args: argparse.Namespace,
+    df,
+    output_format: str,
+    connection_column: str,
+):
+    """
+    Applies the post-query, if any, then sinks and exports the result.
+
+    Args:
+        args: The parsed command-line arguments.
+        df: The combined result of the run.
+        output_format: The export file format.
+        connection_column: The name of the connection column.
+    """
+    if args.post_query:
+        with stage("post_query"):
+            df = run_post_query(df, args.post_query)
+
+    if args.sink_connection:
+        manager = DBConnectionManager(args.environment, [args.sink_connection])
+        try:
+            with stage("sink"):
+                sink_to_connection(
+                    manager.engines[args.sink_connection],
+                    manager.connections[args.sink_connection].type,
+                    df,
+                    args.sink_table,
+                    args.sink_if_exists,
+                )
+        finally:
+            manager.close_all()
+
+    if args.save_path:
+        with stage("export"):
+            export_data(
+                args.save_path,
+                df,
+                output_format,
+                args.single_file,
+                args.single_sheet,
+                connection_column if connection_column in df.columns else None,
+            )
+
+
+def run_diff(args: argparse.Namespace) -> tuple:
+    """
+    Runs or loads both sides of a diff and compares them.
+
+    With --diff-environment, the query's result on --environment is compared
+    with its result on --diff-environment; either side is served from the
+    cache when possible. Otherwise the cached result on --environment is
+    compared with a fresh run.
+
+    Args:
+        args: The parsed command-line arguments.
+
+    Returns:
+        The diff DataFrame and the connection column name.
+    """
+    left_runner = DBConnectionRunner(args.environment, args.connections)
+    right_runner = left_runner
+    try:
+        if args.diff_environment:
+            right_runner = DBConnectionRunner(args.diff_environment, args.connections)
+            left = left_runner.execute_query_multi_db(
+                args.query, ignore_cache=args.ignore_cache, allow_spill=False
+            )
+        else:
+            left = left_runner.load_cached_result(args.query)
+            if left is None:
+                raise ValueError(
+                    "No cached result to compare against! "
+                    "Run the query once or use --diff-environment."
+                )
+
+        # Both sides are compared in memory, so neither may spill to disk.
+        right = right_runner.execute_query_multi_db(
+            args.query,
+            ignore_cache=args.ignore_cache or not args.diff_environment,
+            allow_spill=False,
+        )
+        column_name = left_runner.configurations.column_name
+        df = diff_results(left, right, args.diff_keys, column_name)
+    finally:
+        left_runner.close_all()
+        if right_runner is not left_runner:
+            right_runner.close_all()
+
+    summary = df.groupby(
+        [c for c in [column_name, "change"] if c in df.columns], observed=True
+    ).size()
+    logger.info(
+        f"Diff summary:\n{summary.to_string() if len(df) else 'no differences'}"
+    )
+
+    return df, column_name
+
+
 def main():
     """
     The main function of the application.
     """
     parser = create_arguments()
     args = parser.parse_args()
+    if args.daemon:
+        QueryDaemon(port=args.daemon_port).serve_forever()
+        return
+
+    if args.query is None and not (
+        args.probe or args.schema_report or args.refresh_index
+    ):
+        parser.error("the following arguments are required: -q/--query")
+
+    output_format = args.output_format
+    if output_format is None and args.save_path is not None:
+        output_format = Path(args.save_path).suffix[1:]
+
+    if args.group_by and not args.aggregate:
+        parser.error("--group-by requires --aggregate")
+    if bool(args.order_by) != (args.limit is not None):
+        parser.error("--order-by and --limit must be used together")
+
+    if bool(args.sink_connection) != bool(args.sink_table):
+        parser.error("--sink-connection and --sink-table must be used together")
+
+    partition = None
+    if args.partition_column:
+        if (
+            args.aggregate
+            or args.order_by
+            or args.preview is not None
+            or args.coordinated
+        ):
+            parser.error("--partition-column cannot be combined with other query modes")
+        partition = PartitionPlan(
+            args.partition_column,
+            args.partitions,
+            args.partition_mode,
+            args.lower_bound,
+            args.upper_bound,
+            load_config().get("partitions", {}).get("snapshot", True),
+        )
+    elif args.lower_bound is not None or args.upper_bound is not None:
+        parser.error("--lower-bound and --upper-bound require --partition-column")
+
+    if args.incremental and (
+        args.aggregate or args.order_by or args.preview is not None or args.coordinated
+    ):
+        parser.error("--incremental cannot be combined with other query modes")
+
+    if args.routing_key and (
+        args.aggregate or args.order_by or args.preview is not None or args.coordinated
+    ):
+        parser.error("--routing-key cannot be combined with other query modes")
+
+    if args.preview_sample is not None and args.preview is None:
+        parser.error("--preview-sample requires --preview")
+    if (
+        args.min_rows is not None or args.max_rows is not None
+    ) and not args.coordinated:
+        parser.error("--min-rows and --max-rows require --coordinated")
+    if args.diff_environment and not args.diff_keys:
+        parser.error("--diff-environment requires --diff-keys")
+    if args.diff_keys:
+        df, column_name = run_diff(args)
+        save_results(args, df, output_format, column_name)
+        return
+
+    client = None
+    if args.use_daemon and not (
+        args.probe
+        or args.schema_report
+        or args.aggregate
+        or args.order_by
+        or args.preview
+        or args.coordinated
+        or args.incremental
+        or args.partition_column
+        or args.routing_key
+        or args.refresh_index
+        or args.profile is not None
+    ):
+        client = DaemonClient.find()
+    if client is not None:
+        run_id, df = client.execute_query(
+            args.environment,
+            args.connections,
+            args.query,
+            args.commit,
+            args.ignore_cache,
+        )
+        logger.info(f"Query executed by daemon. Run id: {run_id}")
+        save_results(args, df, output_format, load_config().column_name)
+        return
+
     runner = DBConnectionRunner(
         args.environment,
         args.connections,
         args.save_path,
     )
-    if args.output_format is not None:
-        output_format = args.output_format
-    else:
-        if args.save_path is not None:
-            output_format = Path(args.save_path).suffix[1:]
-    try:
-        df = runner.execute_query_multi_db(
-            args.query,
-            args.commit,
-            args.ignore_cache,
+    if args.probe:
+        try:
+            for connection, result in sorted(runner.probe().items()):
+                if result["success"]:
+                    print(f"{connection}: OK ({result['latency'] * 1000:.0f} ms)")
+                else:
+                    print(f"{connection}: FAILED ({result['error']})")
+        finally:
+            runner.close_all()
+        return
+
+    if args.refresh_index:
+        try:
+            refreshed = runner.refresh_shard_index(args.refresh_index, force=True)
+        finally:
+            runner.close_all()
+        print(
+            f"Index '{args.refresh_index}' rebuilt on {len(refreshed)} connection(s)."
         )
-        if args.save_path:
-            export_data(
-                args.save_path,
-                df,
-                output_format,
-                args.single_file,
-                args.single_sheet,
-                runner.configurations.column_name,
+        return
+
+    if args.schema_report:
+        try:
+            report = runner.schema_report(args.refresh_schema)
+        finally:
+            runner.close_all()
+        if report.empty:
+            print("No schema differences found.")
+        else:
+            print(report.to_string(index=False))
+        save_results(args, report, output_format, "connection")
+        return
+
+    profiler = None
+    if args.profile is not None:
+        profiler = RunProfiler(
+            Path(load_config().get("profiling", {}).get("path", "profiles")),
+            memory="memory" in args.profile,
+            cprofile="cprofile" in args.profile,
+            query=args.query,
+            environment=args.environment,
+            connections=list(runner.connections),
+        )
+        profiler.start()
+
+    df = None
+    try:
+        if args.aggregate:
+            df = runner.execute_aggregate_multi_db(
+                args.query,
+                args.group_by,
+                args.aggregate,
+                args.ignore_cache,
+            )
+        elif args.order_by:
+            df = runner.execute_top_n_multi_db(args.query, args.order_by, args.limit)
+        elif args.coordinated:
+            df = runner.execute_dml_coordinated(
+                args.query, args.commit, args.min_rows, args.max_rows
+            )
+            print(df.to_string(index=False))
+        elif args.preview is not None:
+            df = runner.preview_query_multi_db(
+                args.query, args.preview, args.preview_sample, args.ignore_cache
+            )
+            print(df.to_string(index=False))
+        else:
+            df = runner.execute_query_multi_db(
+                args.query,
+                args.commit,
+                args.ignore_cache,
+                args.incremental,
+                partition=partition,
+                routing_key=args.routing_key,
             )
+        save_results(args, df, output_format, runner.configurations.column_name)
     finally:
+        # Also when saving fails. The cache writer may still be reading the
+        # spill files, so it is flushed first.
+        if isinstance(df, SpilledResult):
+            runner.cache.flush()
+            df.cleanup()
+        # Closing waits for the cache writer, so its time is included.
         runner.close_all()
+        if profiler is not None:
+            path = profiler.stop()
+            print(profiler.summary())
+            print(f"Profile written to {path}")
 
 
 if __name__ == "__main__":